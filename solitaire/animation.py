@@ -0,0 +1,150 @@
+import random
+import time
+from collections import deque
+
+import constants
+import numpy as np
+from PySide6.QtCore import QElapsedTimer, Qt, QTimer
+
+# 胜利动画: 按真实经过的时间计算运动, 与帧率无关
+# 全部卡牌的位置和速度放在数组中, 每帧一次批量计算
+
+
+class WinAnimation:
+    def __init__(self, cards, drops):
+        self.cards = cards  # 按编号排列
+        self.drops = drops
+
+        n = len(cards)
+        self.pos = np.zeros((n, 2))
+        self.vel = np.zeros((n, 2))
+        self.active = np.zeros(n, dtype=bool)
+        self.shown = np.zeros((n, 2), dtype=np.int32)  # 上次 setPos 的整数坐标
+
+        self.scale = 1.0  # 牌桌缩放比例, 距离和速度都随之缩放
+        self.floor = constants.WINDOW_SIZE[1] - constants.CARD_DIMENSIONS.height()
+        self.left = -constants.CARD_DIMENSIONS.width()
+
+        self.frame_times = deque(maxlen=600)  # 最近帧的CPU耗时(ms)
+        self.updates = 0  # 最近一帧 setPos 次数
+
+        self._clock = QElapsedTimer()
+        self._last = 0
+        self._launch_clock = 0.0
+
+        self.timer = QTimer()
+        self.timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.timer.setInterval(constants.WIN_FRAME_MS)
+        self.timer.timeout.connect(self.tick)
+
+    def start(self):
+        if self.timer.isActive():
+            return
+        self.active[:] = False
+        self._launch_clock = constants.WIN_LAUNCH_MS / 1000
+        self.frame_times.clear()
+        self._clock.start()
+        self._last = 0
+        self.timer.start()
+
+    def stop(self):
+        self.timer.stop()
+        self.active[:] = False
+
+    def is_active(self):
+        return self.timer.isActive()
+
+    # 牌桌缩放后, 飞行中的牌按比例换算位置和速度
+    def set_scale(self, scale):
+        ratio = scale / self.scale
+        self.scale = scale
+        self.floor = (constants.WINDOW_SIZE[1] - constants.CARD_DIMENSIONS.height()) * scale
+        self.left = -constants.CARD_DIMENSIONS.width() * scale
+
+        self.pos *= ratio
+        self.vel *= ratio
+        self.shown[:] = -1  # 下一帧全部重新 setPos
+
+    # 从左到右, 取一张归栈顶的牌抛出
+    def launch(self):
+        for drop in self.drops:
+            if drop.cards:
+                card = drop.cards.pop()  # 不是remove, card.stack 仍为 dropstack
+                n = card.id
+                self.pos[n] = card.pos().x(), card.pos().y()
+                self.shown[n] = self.pos[n]
+                self.vel[n] = (
+                    -random.randint(3, 10) * constants.WIN_SPEED * self.scale,
+                    -random.randint(0, 10) * constants.WIN_SPEED * self.scale,
+                )
+                self.active[n] = True
+                return
+
+    def tick(self):
+        now = self._clock.elapsed()
+        dt = min(now - self._last, constants.WIN_MAX_STEP_MS) / 1000
+        self._last = now
+
+        self.advance(dt)
+
+    # 推进 dt 秒
+    def advance(self, dt):
+        start = time.perf_counter()
+
+        self._launch_clock += dt
+        while self._launch_clock >= constants.WIN_LAUNCH_MS / 1000:
+            self._launch_clock -= constants.WIN_LAUNCH_MS / 1000
+            self.launch()
+
+        self.step(dt)
+        self.sync()
+
+        self.frame_times.append((time.perf_counter() - start) * 1000)
+
+    # 批量物理计算: 重力, 落地反弹, 出界
+    def step(self, dt):
+        active = self.active
+        if not active.any():
+            return
+
+        pos, vel = self.pos, self.vel
+        vel[active, 1] += constants.WIN_GRAVITY * self.scale * dt
+        pos[active] += vel[active] * dt
+
+        # 卡牌到底, 损失能量反弹, 还是会因为重力降下来
+        landed = active & (pos[:, 1] > self.floor)
+        if landed.any():
+            vel[landed, 1] = -np.maximum(
+                constants.WIN_SPEED * self.scale, vel[landed, 1] * constants.BOUNCE_ENERGY,
+            )
+            pos[landed, 1] = self.floor
+
+        # 卡牌触边, 放回归栈, 之后再次抛出
+        gone = active & (pos[:, 0] < self.left)
+        if gone.any():
+            active &= ~gone
+            for n in np.flatnonzero(gone):
+                card = self.cards[n]
+                card.stack.add_card(card)
+
+    # 只更新整数坐标发生变化的卡牌
+    def sync(self):
+        rounded = self.pos.astype(np.int32)
+        changed = self.active & (rounded != self.shown).any(axis=1)
+        indexes = np.flatnonzero(changed)
+        for n, (x, y) in zip(indexes, rounded[indexes].tolist()):
+            self.cards[n].setPos(x, y)
+        self.shown[changed] = rounded[changed]
+        self.updates = len(indexes)
+
+    # 帧耗时统计(ms)
+    def stats(self):
+        if not self.frame_times:
+            return None
+        times = np.fromiter(self.frame_times, dtype=float)
+        return {
+            'frames': len(times),
+            'mean_ms': float(times.mean()),
+            'p99_ms': float(np.percentile(times, 99)),
+            'max_ms': float(times.max()),
+        }
@@ -0,0 +1,61 @@
+from PySide6.QtCore import QCoreApplication, QEvent, QObject, QRunnable, QThreadPool, Signal
+from PySide6.QtGui import QImage, QImageReader, QPixmap
+
+# 后台加载图片: 工作线程用 QImageReader 解码为 QImage, 回到GUI线程再转为 QPixmap
+# QPixmap 只能在GUI线程创建
+
+
+class Signals(QObject):
+    decoded = Signal(str, QImage)  # 路径, 图片
+    finished = Signal()  # 全部加载完
+
+
+class Decode(QRunnable):
+    def __init__(self, path, signals):
+        super().__init__()
+        self.path = path
+        self.signals = signals
+
+    def run(self):
+        image = QImageReader(self.path).read()
+        try:
+            self.signals.decoded.emit(self.path, image)  # 跨线程, 排队到GUI线程
+        except RuntimeError:
+            pass  # 程序已退出, signals 已销毁
+
+
+class AssetLoader:
+    def __init__(self, pool=None):
+        self.pool = pool or QThreadPool.globalInstance()
+        self.signals = Signals()
+        self.signals.decoded.connect(self._decoded)
+        self._callbacks = {}  # path -> [callback(pixmap)]
+
+    # 加载完成后在GUI线程调用 callback(pixmap), 同一路径只解码一次
+    def load(self, path, callback):
+        if path in self._callbacks:
+            self._callbacks[path].append(callback)
+            return
+        self._callbacks[path] = [callback]
+        self.pool.start(Decode(path, self.signals))
+
+    def _decoded(self, path, image):
+        pixmap = QPixmap.fromImage(image)
+        for callback in self._callbacks.pop(path, ()):
+            callback(pixmap)
+        if not self._callbacks:
+            self.signals.finished.emit()
+
+    @property
+    def pending(self):
+        return len(self._callbacks)
+
+    # 阻塞到全部加载完, 不依赖事件循环
+    def wait(self):
+        while self._callbacks:
+            self.pool.waitForDone()
+            QCoreApplication.sendPostedEvents(None, QEvent.Type.MetaCall)
+
+
+# 进程内唯一实例
+loader = AssetLoader()
@@ -0,0 +1,273 @@
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PySide6.QtCore import QEvent, QPointF, qVersion
+from PySide6.QtWidgets import QApplication, QGraphicsSceneMouseEvent
+
+# 性能基准, 无界面运行, 输出JSON, 超过阈值时返回非0
+# python bench.py --json bench.json --thresholds bench_thresholds.json
+
+THRESHOLDS_PATH = 'bench_thresholds.json'
+
+
+STARTUP_FIELDS = ('startup', 'first_frame', 'assets_loaded')
+
+
+# 在新进程中测量冷启动: 创建 MainWindow, 画出第一帧, 后台图片全部加载完
+def bench_startup(field='startup'):
+    output = subprocess.run(
+        [sys.executable, __file__, '--startup-only'], capture_output=True, text=True, check=True,
+    ).stdout
+    return float(output.split()[STARTUP_FIELDS.index(field)])
+
+
+def startup_only():
+    start = time.perf_counter()
+    app = QApplication(sys.argv)
+
+    from assets import loader
+    from main import MainWindow
+
+    window = MainWindow(resume=False, stats_path=None, replay_path=None, resume_path=None)
+    created = time.perf_counter()
+
+    while window.view.first_frame_at is None:
+        app.processEvents()
+    loader.wait()
+    loaded = time.perf_counter()
+
+    print(created - start, window.view.first_frame_at - start, loaded - start)
+    window.close()
+
+
+def bench_shuffle(window, n=100):
+    start = time.perf_counter()
+    for seed in range(n):
+        window.shuffle_and_stack(seed)
+    return (time.perf_counter() - start) / n
+
+
+def bench_deal(window, n=1000):
+    window.shuffle_and_stack(0)
+    window.set_rounds_n(None)  # 无限回合, 包含重洗
+    start = time.perf_counter()
+    for _ in range(n):
+        window.deal()
+    elapsed = time.perf_counter() - start
+    window.set_rounds_n(3)
+    return elapsed
+
+
+# 通过 Card.mousePressEvent/mouseReleaseEvent 模拟拖放
+def drag(card, target):
+    press = QGraphicsSceneMouseEvent(QEvent.Type.GraphicsSceneMousePress)
+    card.mousePressEvent(press)
+
+    tail = target.cards[-1] if target.cards else target
+    dest = tail.scenePos() + QPointF(0, 15 if target.cards else 0)
+    card.setPos(card.pos() + (dest - card.scenePos()))
+
+    release = QGraphicsSceneMouseEvent(QEvent.Type.GraphicsSceneMouseRelease)
+    card.mouseReleaseEvent(release)
+
+
+def bench_drag(window, n=500):
+    import moves
+
+    rng = random.Random(0)
+    window.shuffle_and_stack(1)
+    window.set_rounds_n(None)
+
+    done = 0
+    start = time.perf_counter()
+    while done < n:
+        game = window.game_state()
+        flipped = False
+        # 点击翻开背面牌
+        for stack in window.works:
+            if stack.cards and not stack.cards[-1].is_face_up:
+                stack.cards[-1].mousePressEvent(QGraphicsSceneMouseEvent(QEvent.Type.GraphicsSceneMousePress))
+                flipped = True
+        legal = moves.legal_moves(game)
+        if flipped or not legal or rng.random() < 0.2:
+            if window.deal_cards() is None:
+                window.shuffle_and_stack(rng.randrange(1000))
+            continue
+        src, index, dst = rng.choice(legal)
+        drag(window.stacks[src].cards[index], window.stacks[dst])
+        done += 1
+    elapsed = time.perf_counter() - start
+
+    window.set_rounds_n(3)
+    return elapsed / n
+
+
+# 工作栈中摆一列 K 到 A 的13张正面牌, 其它牌放在别的栈
+def long_run(window):
+    for stack in window.stacks:
+        stack.reset()
+
+    run = [window.cards[(n % 2 + 1) * 13 + 12 - n] for n in range(13)]  # 黑桃/红心交替
+    for card in run:
+        card.turn_face_up()
+        window.works[0].add_card(card)
+
+    rest = [card for card in window.cards if card not in run]
+    for n, stack in enumerate(window.works[1:], 1):
+        for a in range(n + 1):
+            card = rest.pop()
+            if a == n:
+                card.turn_face_up()
+            else:
+                card.turn_back_up()
+            stack.add_card(card)
+    window.deckstack.stack_cards(rest)
+    return run[0]
+
+
+# 拖动整列时每帧的绘制耗时, 由 TableView 统计
+def bench_drag_paint(window, profile, frames=300):
+    import rendering
+
+    app = QApplication.instance()
+    window.show()
+    rendering.apply_profile(window.view, profile)
+
+    card = long_run(window)
+    app.processEvents()
+
+    window.view.set_instrumented(True)
+    app.processEvents()
+    window.view.stats.clear()
+
+    card.stack.activate()
+    start = card.pos()
+    for n in range(frames):
+        card.setPos(start + QPointF(100 + n % 100 * 4, 50 + n % 50 * 3))
+        app.processEvents()
+        app.processEvents()
+    card.stack.deactivate()
+
+    paint = statistics.median(window.view.stats.paint_ms.values()) / 1000
+    window.view.set_instrumented(False)
+    rendering.apply_profile(window.view, rendering.DEFAULT)
+    window.shuffle_and_stack(0)
+    return paint
+
+
+# report 收到最后一次的每帧CPU耗时统计, 见 WinAnimation.stats
+def bench_win_animation(window, frames=600, report=None):
+    for stack in window.stacks:
+        stack.reset()
+    for n, drop in enumerate(window.drops):
+        cards = window.cards[n * 13:(n + 1) * 13]
+        for card in cards:
+            card.turn_face_up()
+        drop.add_cards(cards)
+
+    window.check_win_condition()
+    # 手动推进, 固定 1/60 秒一帧; 期间不处理事件, 计时器不会触发
+    # 计时器保持启动, 牌回到归栈时的 COMPLETE 不会重新开始动画
+
+    start = time.perf_counter()
+    for _ in range(frames):
+        window.animation.advance(1 / 60)
+    elapsed = time.perf_counter() - start
+    if report is not None:
+        report.update(window.animation.stats())
+
+    window.animation.stop()
+    window.shuffle_and_stack(0)
+    return elapsed
+
+
+def run(repeat):
+    app = QApplication(sys.argv)
+
+    from main import MainWindow
+
+    window = MainWindow(resume=False, stats_path=None, replay_path=None, resume_path=None)
+    win_frames = {}
+
+    benchmarks = {
+        'startup_ms': bench_startup,
+        'first_frame_ms': lambda: bench_startup('first_frame'),
+        'assets_loaded_ms': lambda: bench_startup('assets_loaded'),
+        'shuffle_and_stack_ms': lambda: bench_shuffle(window),
+        'deal_1000_ms': lambda: bench_deal(window),
+        'drag_drop_ms': lambda: bench_drag(window),
+        'win_animation_600_frames_ms': lambda: bench_win_animation(window, report=win_frames),
+        'drag_paint_default_ms': lambda: bench_drag_paint(window, 'default'),
+        'drag_paint_performance_ms': lambda: bench_drag_paint(window, 'performance'),
+    }
+
+    results = {}
+    for name, func in benchmarks.items():
+        runs = [func() * 1000 for _ in range(repeat)]
+        results[name] = {'median': statistics.median(runs), 'min': min(runs), 'runs': runs}
+    results['win_animation_600_frames_ms']['frame_cpu'] = win_frames
+
+    window.close()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the solitaire hot paths offscreen.')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', default=None, help='write results to this file')
+    parser.add_argument('--thresholds', default=THRESHOLDS_PATH, help='max median ms per benchmark')
+    parser.add_argument('--startup-only', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.startup_only:
+        startup_only()
+        return 0
+
+    results = run(args.repeat)
+
+    thresholds = {}
+    if args.thresholds and os.path.exists(args.thresholds):
+        with open(args.thresholds) as f:
+            thresholds = json.load(f)
+
+    failed = []
+    for name, result in results.items():
+        limit = thresholds.get(name)
+        result['threshold'] = limit
+        result['ok'] = limit is None or result['median'] <= limit
+        if not result['ok']:
+            failed.append(name)
+
+    report = {
+        'python': platform.python_version(),
+        'qt': qVersion(),
+        'platform': os.environ['QT_QPA_PLATFORM'],
+        'repeat': args.repeat,
+        'benchmarks': results,
+        'failed': failed,
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.json:
+        with open(args.json, 'w') as f:
+            f.write(text)
+    print(text)
+
+    for name in failed:
+        print('REGRESSION {}: {:.3f} ms > {} ms'.format(
+            name, results[name]['median'], results[name]['threshold'],
+        ), file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
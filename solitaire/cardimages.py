@@ -0,0 +1,171 @@
+import os
+import sys
+from collections import OrderedDict
+
+import constants
+from PySide6.QtCore import QPoint, QRect, Qt
+from PySide6.QtGui import QImage, QPainter, QPixmap
+
+# 精灵图: 前4行按SUITS排列, 每行13列(1-13); 第5行第1格为牌背
+ATLAS_PATH = os.path.join('images', 'cards.png')
+ATLAS_COLUMNS = 13
+BACK_PATH = os.path.join('images', 'back.png')
+
+SCALED_CACHE_LIMIT = 3 * 53  # 约三种尺寸的全部图片, 限制放大和高DPI时的内存
+
+
+# 全局卡牌图片缓存, 每个资源只解码一次, 所有Card共享同一份QPixmap
+# 启动时由 load_async 在后台预加载; 还没到的图片在第一次用到时同步解码
+# face/back 返回当前尺寸的图片, 缩放结果按 (图片, 尺寸) 放在LRU缓存中, 绘制时不再变换
+class CardImages:
+    def __init__(self, atlas_path=ATLAS_PATH, cache_limit=SCALED_CACHE_LIMIT):
+        self.atlas_path = atlas_path
+        self._faces = {}  # (value, suit) -> QPixmap, 原始尺寸
+        self._back = None
+
+        self.size = None  # (宽, 高, 设备像素比), None 为原始尺寸
+        self.cache_limit = cache_limit
+        self._scaled = OrderedDict()  # (value, suit, 宽, 高, 像素比) -> QPixmap, back 的 value 为 0
+
+    # 精灵图中的位置
+    @staticmethod
+    def atlas_rect(row, column):
+        w, h = constants.CARD_DIMENSIONS.width(), constants.CARD_DIMENSIONS.height()
+        return QRect(column * w, row * h, w, h)
+
+    @property
+    def loaded(self):
+        return self._back is not None and len(self._faces) == len(constants.SUITS) * 13
+
+    # 一次性加载全部图片, 优先使用精灵图
+    def load(self):
+        if self.loaded:
+            return
+
+        if os.path.exists(self.atlas_path):
+            self._split_atlas(QPixmap(self.atlas_path))
+        else:
+            for suit in constants.SUITS:
+                for value in range(1, 14):
+                    self._original_face(value, suit)
+            self._original_back()
+
+    # 后台解码全部图片, 已经同步解码过的保留原来的
+    def load_async(self, loader):
+        if os.path.exists(self.atlas_path):
+            loader.load(self.atlas_path, self._split_atlas)
+            return
+
+        for suit in constants.SUITS:
+            for value in range(1, 14):
+                if (value, suit) not in self._faces:
+                    loader.load(
+                        face_path(value, suit),
+                        lambda pixmap, key=(value, suit): self._faces.setdefault(key, pixmap),
+                    )
+        if self._back is None:
+            loader.load(BACK_PATH, self._set_back)
+
+    def _split_atlas(self, atlas):
+        for row, suit in enumerate(constants.SUITS):
+            for value in range(1, 14):
+                self._faces.setdefault((value, suit), atlas.copy(self.atlas_rect(row, value - 1)))
+        self._set_back(atlas.copy(self.atlas_rect(len(constants.SUITS), 0)))
+
+    def _set_back(self, pixmap):
+        if self._back is None:
+            self._back = pixmap
+
+    # 卡牌显示尺寸(逻辑像素)和设备像素比
+    def set_size(self, size, ratio=1.0):
+        if size == constants.CARD_DIMENSIONS and ratio == 1:
+            self.size = None
+        else:
+            self.size = size.width(), size.height(), ratio
+
+    def face(self, value, suit):
+        if self.size is None:
+            return self._original_face(value, suit)
+        return self._scaled_pixmap((value, suit) + self.size, lambda: self._original_face(value, suit))
+
+    def back(self):
+        if self.size is None:
+            return self._original_back()
+        return self._scaled_pixmap((0, None) + self.size, self._original_back)
+
+    def _scaled_pixmap(self, key, original):
+        pixmap = self._scaled.get(key)
+        if pixmap is not None:
+            self._scaled.move_to_end(key)
+            return pixmap
+
+        width, height, ratio = key[2:]
+        pixmap = original().scaled(
+            round(width * ratio), round(height * ratio),
+            Qt.AspectRatioMode.IgnoreAspectRatio, Qt.TransformationMode.SmoothTransformation,
+        )
+        pixmap.setDevicePixelRatio(ratio)
+
+        self._scaled[key] = pixmap
+        if len(self._scaled) > self.cache_limit:
+            self._scaled.popitem(last=False)
+        return pixmap
+
+    def _original_face(self, value, suit):
+        pixmap = self._faces.get((value, suit))
+        if pixmap is None:
+            if os.path.exists(self.atlas_path):
+                self.load()
+                return self._faces[value, suit]
+            pixmap = self._faces[value, suit] = QPixmap(face_path(value, suit))
+        return pixmap
+
+    def _original_back(self):
+        if self._back is None:
+            if os.path.exists(self.atlas_path):
+                self.load()
+            else:
+                self._back = QPixmap(BACK_PATH)
+        return self._back
+
+    def clear(self):
+        self._faces = {}
+        self._back = None
+        self._scaled.clear()
+
+
+def face_path(value, suit):
+    return os.path.join('cards', '%s%s.png' % (value, suit))
+
+
+# 由单张图片生成精灵图
+def build_atlas(path=ATLAS_PATH):
+    w, h = constants.CARD_DIMENSIONS.width(), constants.CARD_DIMENSIONS.height()
+    atlas = QImage(w * ATLAS_COLUMNS, h * (len(constants.SUITS) + 1), QImage.Format.Format_ARGB32)
+    atlas.fill(0)
+
+    painter = QPainter(atlas)
+    for row, suit in enumerate(constants.SUITS):
+        for value in range(1, 14):
+            rect = CardImages.atlas_rect(row, value - 1)
+            painter.drawImage(QPoint(rect.x(), rect.y()), QImage(face_path(value, suit)))
+    rect = CardImages.atlas_rect(len(constants.SUITS), 0)
+    painter.drawImage(QPoint(rect.x(), rect.y()), QImage(BACK_PATH))
+    painter.end()
+
+    return atlas.save(path)
+
+
+# 进程内唯一实例
+card_images = CardImages()
+
+
+if __name__ == "__main__":
+    # python cardimages.py [path]
+    from PySide6.QtGui import QGuiApplication
+
+    app = QGuiApplication(sys.argv)
+    target = sys.argv[1] if len(sys.argv) > 1 else ATLAS_PATH
+    if not build_atlas(target):
+        sys.exit('could not write %s' % target)
+    print('Atlas written to {}'.format(target))
@@ -1,14 +1,10 @@
-import os
-
 from PySide6.QtCore import QRect, QSize
-from PySide6.QtGui import QImage
 
 WINDOW_SIZE = 840, 600 # tuple
 
 CARD_DIMENSIONS = QSize(80, 116)  # 二维对象
 CARD_RECT = QRect(0, 0, 80, 116) #矩形
 CARD_SPACING_X = 110 # 卡槽间隔
-CARD_BACK = QImage(os.path.join('images','back.png'))
 
 # DealTrigger->
 DEAL_RECT = QRect(30, 30, 110, 140)
@@ -17,11 +13,35 @@ OFFSET_X = 50
 OFFSET_Y = 50
 WORK_STACK_Y = 200
 
+# 缩放, 相对适应窗口的大小
+ZOOM_STEP = 0.25
+ZOOM_MIN = 0.5
+ZOOM_MAX = 2.0
+
+FELT_COLOR = '#426f25'  # felt.png 的平均色, 图片加载前的背景
+
+HINT_MS = 1000  # 提示框显示时间
+
+AUTOCOMPLETE_MS = 100  # 自动完成, 每次间隔
+AUTOCOMPLETE_BATCH = 4  # 每次归栈的牌数
+
+ESTIMATE_DELAY_MS = 300  # 走牌后多久开始估计胜率
+ESTIMATE_SAMPLES = 2000  # 最多模拟的局数
+REPLAY_MS = 300  # 回放, 1 倍速时每步间隔
+REPLAY_SPEEDS = 0.5, 1, 2, 4, 10
+
 SIDE_FACE = 0
 SIDE_BACK = 1
 
 BOUNCE_ENERGY = 0.8
 
+# 胜利动画, 速度单位为 像素/秒
+WIN_FRAME_MS = 16  # 约60帧
+WIN_LAUNCH_MS = 150  # 每隔多久抛出一张牌
+WIN_MAX_STEP_MS = 50  # 卡顿时单帧最多推进的时间
+WIN_SPEED = 60  # 初速度的单位
+WIN_GRAVITY = 3600
+
 # We store cards as numbers 1-13, since we only need
 # to know their order for solitaire.
 SUITS = ["C", "S", "H", "D"]
\ No newline at end of file
@@ -0,0 +1,138 @@
+import argparse
+import multiprocessing
+import os
+import random
+import struct
+import sys
+
+import solver
+
+# 牌局索引: 预先求解一段连续种子, 记录是否有解, 解的步数和难度
+# 文件结构:
+#   头部       magic, 版本, deal_n, rounds_n(0=无限), 难度数, 起始种子, 种子数
+#   难度表     每个难度 (偏移, 数量), 指向按难度分组的种子表
+#   记录       每个种子一条, 按种子顺序, 可直接定位
+#   种子表     有解的种子, 按难度分组
+# python dealindex.py --count 10000 --deal-n 3 --rounds-n 3
+
+MAGIC = b'SDIX'
+VERSION = 1
+
+HEADER = struct.Struct('<4sBBBBII')
+BUCKET = struct.Struct('<II')
+RECORD = struct.Struct('<BBHI')  # status, difficulty, moves, nodes
+SEED = struct.Struct('<I')
+
+STATUSES = (solver.UNSOLVABLE, solver.SOLVED, solver.UNKNOWN)
+
+# 难度按搜索节点数划分
+DIFFICULTIES = ('Easy', 'Medium', 'Hard')
+DIFFICULTY_NODES = (200, 2000)
+
+
+def difficulty(nodes):
+    for n, limit in enumerate(DIFFICULTY_NODES):
+        if nodes < limit:
+            return n
+    return len(DIFFICULTY_NODES)
+
+
+def index_path(deal_n, rounds_n, folder='deals'):
+    return os.path.join(folder, 'deals-%s-%s.idx' % (deal_n, rounds_n or 'u'))
+
+
+class DealIndex:
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+
+        magic, version, self.deal_n, rounds_n, n_buckets, self.start, self.count = \
+            HEADER.unpack(self.file.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('%s is not a deal index' % path)
+        self.rounds_n = rounds_n or None
+
+        self.buckets = [BUCKET.unpack(self.file.read(BUCKET.size)) for _ in range(n_buckets)]
+        self._records_at = HEADER.size + BUCKET.size * n_buckets
+        self._seeds_at = self._records_at + RECORD.size * self.count
+
+    def close(self):
+        self.file.close()
+
+    def __contains__(self, seed):
+        return self.start <= seed < self.start + self.count
+
+    # O(1) 按种子查询 -> (status, difficulty, moves, nodes)
+    def lookup(self, seed):
+        if seed not in self:
+            return None
+        self.file.seek(self._records_at + RECORD.size * (seed - self.start))
+        status, bucket, moves, nodes = RECORD.unpack(self.file.read(RECORD.size))
+        return STATUSES[status], bucket, moves, nodes
+
+    # O(1) 随机挑一局指定难度的有解牌局
+    def pick(self, bucket, rng=random):
+        offset, count = self.buckets[bucket]
+        if not count:
+            return None
+        self.file.seek(self._seeds_at + SEED.size * (offset + rng.randrange(count)))
+        return SEED.unpack(self.file.read(SEED.size))[0]
+
+
+def write_index(path, results, deal_n, rounds_n, start, count):
+    records = [None] * count
+    grouped = [[] for _ in DIFFICULTIES]
+    for result in results:
+        bucket = difficulty(result.nodes)
+        status = STATUSES.index(result.status)
+        records[result.seed - start] = RECORD.pack(status, bucket, min(result.moves or 0, 0xFFFF), result.nodes)
+        if result.status == solver.SOLVED:
+            grouped[bucket].append(result.seed)
+
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, deal_n, rounds_n or 0, len(DIFFICULTIES), start, count))
+        offset = 0
+        for seeds in grouped:
+            f.write(BUCKET.pack(offset, len(seeds)))
+            offset += len(seeds)
+        f.write(b''.join(records))
+        for seeds in grouped:
+            for seed in sorted(seeds):
+                f.write(SEED.pack(seed))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build a deal index of solved seeds.')
+    parser.add_argument('--start', type=int, default=0, help='first seed')
+    parser.add_argument('--count', type=int, default=1000, help='number of seeds')
+    parser.add_argument('--deal-n', type=int, default=3, choices=(1, 3))
+    parser.add_argument('--rounds-n', type=solver.rounds_arg, default=3, help='3, 5 or unlimited')
+    parser.add_argument('--max-nodes', type=int, default=50000, help='node limit per deal')
+    parser.add_argument('--processes', type=int, default=None, help='worker processes (default: all cores)')
+    parser.add_argument('-o', '--output', default=None, help='index file (default: deals/deals-N-R.idx)')
+    args = parser.parse_args(argv)
+
+    path = args.output or index_path(args.deal_n, args.rounds_n)
+    jobs = [
+        (seed, args.deal_n, args.rounds_n, args.max_nodes)
+        for seed in range(args.start, args.start + args.count)
+    ]
+
+    processes = args.processes or multiprocessing.cpu_count()
+    with multiprocessing.Pool(processes) as pool:
+        results = pool.map(solver._solve_args, jobs, max(1, len(jobs) // (processes * 16)))
+
+    write_index(path, results, args.deal_n, args.rounds_n, args.start, args.count)
+
+    index = DealIndex(path)
+    print('Index written to {}: {}'.format(path, ', '.join(
+        '{} {}'.format(count, name) for name, (_, count) in zip(DIFFICULTIES, index.buckets)
+    )), file=sys.stderr)
+    index.close()
+
+
+if __name__ == "__main__":
+    main()
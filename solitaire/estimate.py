@@ -0,0 +1,172 @@
+import math
+import random
+import threading
+
+import moves
+from model import DEAL, DECK, DROPS, RESTACK, WORKS
+from moves import drop_index, legal_moves
+from PySide6.QtCore import QObject, QRunnable, Signal
+
+# 胜率估计: 只看玩家能看到的牌局, 随机补全背面的牌, 用简单的贪心策略下完, 统计赢的比例
+# 背面牌: 工作栈里的背面牌, 以及还没翻过一轮的牌堆(重洗过之后牌堆里的牌都见过)
+
+MAX_STEPS = 1000  # 单局最多步数
+BATCH = 16  # 每下完多少局报告一次
+
+
+# 玩家看不到的牌的位置 [(栈, 序号)]
+def hidden_slots(game):
+    face_up = game.face_up
+    slots = [(src, n) for src in WORKS for n, card in enumerate(game.stacks[src]) if not face_up[card]]
+    if game.restack_counter == 0:
+        slots += [(DECK, n) for n in range(len(game.stacks[DECK]))]
+    return slots
+
+
+# 背面牌随机换位后的一种可能牌局
+def sample(game, slots, rng):
+    game = game.copy()
+    cards = [game.stacks[src][n] for src, n in slots]
+    rng.shuffle(cards)
+    for (src, n), card in zip(slots, cards):
+        game.stacks[src][n] = card
+    return game
+
+
+# 贪心选一步, 按优先级:
+#   0 归栈
+#   1 翻出背面牌
+#   2 露出能归栈的牌
+#   3 发牌栈的牌放上工作栈(空栈只放K)
+#   4 整列移走空出工作栈, 且有K可以放进去
+# 不做来回挪动的走法
+def greedy_move(game):
+    stacks, face_up = game.stacks, game.face_up
+    tops = [game.top(dst) for dst in DROPS]
+    best = None
+    for move in legal_moves(game):
+        src, index, dst = move
+        if dst in DROPS:
+            return move
+        if src == DEAL:
+            if not stacks[dst] and stacks[DEAL][-1] % 13 != 12:
+                continue
+            rank = 3
+        elif index > 0:
+            below = stacks[src][index - 1]
+            if not face_up[below]:
+                rank = 1
+            elif drop_index(tops, below) is not None:
+                rank = 2
+            else:
+                continue
+        elif stacks[dst] and king_waiting(game):
+            rank = 4
+        else:
+            continue
+        if best is None or rank < best[0]:
+            best = rank, move
+    return best and best[1]
+
+
+# 有没有等着空栈的K: 压着背面牌的K, 或者发牌栈顶的K
+def king_waiting(game):
+    stacks, face_up = game.stacks, game.face_up
+    if stacks[DEAL] and stacks[DEAL][-1] % 13 == 12:
+        return True
+    for src in WORKS:
+        cards = stacks[src]
+        for n in range(1, len(cards)):
+            if face_up[cards[n]] and not face_up[cards[n - 1]]:
+                if cards[n] % 13 == 12:
+                    return True
+                break
+    return False
+
+
+# 在 game 上下完一局, 返回是否赢了
+def playout(game, max_steps=MAX_STEPS):
+    stacks = game.stacks
+    progress = True  # 上次重洗之后走过牌
+    for _ in range(max_steps):
+        if sum(len(stacks[dst]) for dst in DROPS) == 52:
+            return True
+
+        move = greedy_move(game)
+        if move:
+            game.move(*move)
+            src = move[0]
+            if src != DEAL and game.can_flip(src):
+                game.flip(src)
+            progress = True
+            continue
+
+        record = game.deal()
+        if record is None:
+            return False
+        if record[0] == RESTACK:
+            if not progress:
+                return False  # 整轮没有可走的牌, 之后只会重复
+            progress = False
+    return False
+
+
+# 逐批产生 (赢的局数, 总局数)
+def estimate(game, n, seed=None, cancelled=None):
+    rng = random.Random(seed)
+    slots = hidden_slots(game)
+    wins = 0
+    for total in range(1, n + 1):
+        if cancelled is not None and cancelled.is_set():
+            return
+        wins += playout(sample(game, slots, rng))
+        if total % BATCH == 0 or total == n:
+            yield wins, total
+
+
+# 95% 置信区间的半宽
+def margin(wins, total):
+    p = wins / total
+    return 1.96 * math.sqrt(p * (1 - p) / total)
+
+
+class Signals(QObject):
+    progress = Signal(int, int, int)  # 任务号, 赢的局数, 总局数
+    hint = Signal(int, object)  # 提示时的牌局版本, moves.hint 的结果
+
+
+# 后台估计, 放进 QThreadPool; cancel() 后在下一局开始前停止
+class EstimateTask(QRunnable):
+    def __init__(self, game, generation, n, signals):
+        super().__init__()
+        self.game = game
+        self.generation = generation
+        self.n = n
+        self.signals = signals
+        self.cancelled = threading.Event()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def run(self):
+        for wins, total in estimate(self.game, self.n, cancelled=self.cancelled):
+            try:
+                self.signals.progress.emit(self.generation, wins, total)
+            except RuntimeError:
+                return  # 程序已退出
+
+
+# 后台求解提示, 求解器可能要几百毫秒, 不在界面线程中运行
+class HintTask(QRunnable):
+    def __init__(self, game, generation, signals):
+        super().__init__()
+        self.game = game
+        self.generation = generation
+        self.signals = signals
+
+    def run(self):
+        hint = moves.hint(self.game)
+        try:
+            self.signals.hint.emit(self.generation, hint)
+        except RuntimeError:
+            pass  # 程序已退出
@@ -0,0 +1,169 @@
+import json
+import time
+from array import array
+
+from PySide6.QtCore import QRect, Qt, QTimer
+from PySide6.QtGui import QColor, QFont
+from PySide6.QtWidgets import QGraphicsView
+
+# 帧耗时和输入延迟统计, 固定大小的环形缓冲区, 默认关闭
+
+FRAMESTATS_PATH = 'framestats.json'  # View > Dump frame stats
+
+
+class RingBuffer:
+    def __init__(self, size, typecode='d'):
+        self.size = size
+        self.data = array(typecode, bytes(array(typecode).itemsize * size))
+        self.count = 0  # 累计写入次数
+
+    def append(self, value):
+        self.data[self.count % self.size] = value
+        self.count += 1
+
+    def __len__(self):
+        return min(self.count, self.size)
+
+    # 按时间顺序
+    def values(self):
+        if self.count <= self.size:
+            return self.data[:self.count].tolist()
+        start = self.count % self.size
+        return (self.data[start:] + self.data[:start]).tolist()
+
+    def clear(self):
+        self.count = 0
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+class FrameStats:
+    def __init__(self, size=1024):
+        self.times = RingBuffer(size)  # 帧结束时间(s)
+        self.paint_ms = RingBuffer(size)  # 每帧绘制耗时
+        self.updates = RingBuffer(size, 'I')  # 每帧之前场景的更新区域数
+        self.latency_ms = RingBuffer(size)  # 鼠标按下到重绘完成
+
+    def add_frame(self, end, paint_ms, updates):
+        self.times.append(end)
+        self.paint_ms.append(paint_ms)
+        self.updates.append(updates)
+
+    def add_latency(self, ms):
+        self.latency_ms.append(ms)
+
+    # 最近一秒的帧数
+    def fps(self, now=None):
+        now = time.perf_counter() if now is None else now
+        return sum(1 for t in self.times.values() if now - t <= 1.0)
+
+    def summary(self):
+        paint = self.paint_ms.values()
+        latency = self.latency_ms.values()
+        return {
+            'frames': self.times.count,
+            'fps': self.fps(),
+            'paint_p50_ms': percentile(paint, 50),
+            'paint_p99_ms': percentile(paint, 99),
+            'latency_p50_ms': percentile(latency, 50),
+            'latency_p99_ms': percentile(latency, 99),
+        }
+
+    def dump(self, path):
+        data = {
+            'summary': self.summary(),
+            'frames': [
+                {'time': t, 'paint_ms': p, 'updates': u}
+                for t, p, u in zip(self.times.values(), self.paint_ms.values(), self.updates.values())
+            ],
+            'latency_ms': self.latency_ms.values(),
+        }
+        with open(path, 'w') as f:
+            json.dump(data, f, indent=1)
+
+    def clear(self):
+        for buffer in (self.times, self.paint_ms, self.updates, self.latency_ms):
+            buffer.clear()
+
+
+# 牌桌视图, 开启统计后记录每帧绘制耗时, 场景更新数和点击延迟, 并在左上角显示
+class TableView(QGraphicsView):
+    OVERLAY_RECT = QRect(4, 4, 230, 58)
+    LATENCY_TIMEOUT = 1.0  # 超过1秒没有重绘, 不计入延迟
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = None
+        self.first_frame_at = None  # 第一帧画完的时间(perf_counter), 用于测量启动
+        self._updates = 0
+        self._pressed_at = None
+
+        # 叠加层每0.5秒刷新一次
+        self._overlay_timer = QTimer()
+        self._overlay_timer.setInterval(500)
+        self._overlay_timer.timeout.connect(lambda: self.viewport().update(self.OVERLAY_RECT))
+
+    # 只在开启时连接 scene.changed, 连接后场景会改走较慢的更新路径
+    def set_instrumented(self, enabled):
+        if enabled and self.stats is None:
+            self.stats = FrameStats()
+            self._updates = 0
+            self.scene().changed.connect(self._scene_changed)
+            self._overlay_timer.start()
+        elif not enabled and self.stats is not None:
+            self.stats = None
+            self.scene().changed.disconnect(self._scene_changed)
+            self._overlay_timer.stop()
+        self.viewport().update()
+
+    def _scene_changed(self, regions):
+        self._updates += len(regions)
+
+    def mousePressEvent(self, event):
+        if self.stats is not None:
+            self._pressed_at = time.perf_counter()
+        super().mousePressEvent(event)
+
+    def paintEvent(self, event):
+        if self.stats is None:
+            super().paintEvent(event)
+            if self.first_frame_at is None:
+                self.first_frame_at = time.perf_counter()
+            return
+
+        start = time.perf_counter()
+        super().paintEvent(event)
+        end = time.perf_counter()
+
+        self.stats.add_frame(end, (end - start) * 1000, self._updates)
+        self._updates = 0
+
+        if self._pressed_at is not None:
+            if end - self._pressed_at <= self.LATENCY_TIMEOUT:
+                self.stats.add_latency((end - self._pressed_at) * 1000)
+            self._pressed_at = None
+
+    def drawForeground(self, painter, rect):
+        super().drawForeground(painter, rect)
+        if self.stats is None:
+            return
+
+        summary = self.stats.summary()
+        painter.save()
+        painter.resetTransform()  # 视口坐标
+        painter.fillRect(self.OVERLAY_RECT, QColor(0, 0, 0, 160))
+        painter.setPen(QColor('white'))
+        painter.setFont(QFont('monospace', 8))
+        painter.drawText(
+            self.OVERLAY_RECT.adjusted(6, 4, -6, -4),
+            Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignTop,
+            'FPS {fps:3d}\n'
+            'paint p50 {paint_p50_ms:5.2f} ms  p99 {paint_p99_ms:5.2f} ms\n'
+            'input p50 {latency_p50_ms:5.1f} ms  p99 {latency_p99_ms:5.1f} ms'.format(**summary),
+        )
+        painter.restore()
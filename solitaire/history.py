@@ -0,0 +1,40 @@
+from collections import deque
+
+# 撤销/重做记录, 命令格式同 model 的操作记录:
+#   (MOVE, src, dst, n) | (FLIP, stack) | (DEAL_CARDS, n, spread_from) | (RESTACK, n)
+# 只保存栈编号和牌数, 不保存场景快照; 超过上限时丢弃最早的记录
+
+
+class History:
+    def __init__(self, limit=10000):
+        self.limit = limit
+        self._undo = deque(maxlen=limit)
+        self._redo = deque(maxlen=limit)
+
+    # 新操作, 清空重做
+    def push(self, command):
+        self._undo.append(command)
+        self._redo.clear()
+
+    def undo(self):
+        command = self._undo.pop()
+        self._redo.append(command)
+        return command
+
+    def redo(self):
+        command = self._redo.pop()
+        self._undo.append(command)
+        return command
+
+    def can_undo(self):
+        return bool(self._undo)
+
+    def can_redo(self):
+        return bool(self._redo)
+
+    def clear(self):
+        self._undo.clear()
+        self._redo.clear()
+
+    def __len__(self):
+        return len(self._undo)
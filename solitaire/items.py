@@ -1,20 +1,36 @@
-import os
 from typing import *
 
 import constants
-from PySide6.QtCore import QObject, QPointF, QRectF, Qt, Signal
-from PySide6.QtGui import QBrush, QColor, QPen, QPixmap
+import model
+from cardimages import card_images
+from PySide6.QtCore import QObject, QPointF, QRectF, Qt, QTimer, Signal
+from PySide6.QtGui import QBrush, QColor, QPen
 from PySide6.QtWidgets import (
     QGraphicsItem,
     QGraphicsPixmapItem,
     QGraphicsRectItem,
+    QGraphicsScene,
 )
 
 
-class Signals(QObject):
-    comlpete = Signal()
-    clicked = Signal()
-    doubleclicked = Signal()
+# 事件类型, 由场景的 dispatcher 统一发出 (图形项, 事件, 参数)
+# 卡牌和栈不再各带一个 QObject
+CLICKED = 0  # 发牌器
+DOUBLECLICKED = 1  # 卡牌
+MOVED = 2  # 卡牌, 参数为来源栈, 移动的是这张牌及其上面的牌
+FLIPPED = 3  # 卡牌
+COMPLETE = 4  # 归栈集齐
+
+
+class Dispatcher(QObject):
+    item_event = Signal(object, int, object)
+
+
+# 通过 item 所在场景发出事件, 不在场景中时忽略
+def emit(item, event, arg=None):
+    scene = item.scene()
+    if scene is not None:
+        scene.dispatcher.item_event.emit(item, event, arg)
 
 
 # 卡牌
@@ -22,29 +38,28 @@ class Card(QGraphicsPixmapItem):
     def __init__(self, value, suit):
         super().__init__()
 
-        self.signals = Signals()  # 信号写在这里
-
         self.stack = None  # 所属栈
+        self.index = None  # 在所属栈中的位置
         self.child = None  # 孩子
 
         self.value = value
         self.suit = suit
+        self.id = model.card_id(value, suit)  # 模型中的编号 0-51
         self.side = None  # face | back
 
-        self.vector = None  # 向量
-
         # 边界,可动,限制移动
         self.setShapeMode(QGraphicsPixmapItem.ShapeMode.BoundingRectShape)
         self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemIsMovable)
         self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemSendsGeometryChanges)
 
-        self.load_images()
-
-    # 加载正反面
-    def load_images(self):
-        self.face = QPixmap(os.path.join('cards', '%s%s.png' % (self.value, self.suit)))
+    # 正反面, 共享全局缓存中的图片, 第一次显示时才需要
+    @property
+    def face(self):
+        return card_images.face(self.value, self.suit)
 
-        self.back = QPixmap(os.path.join('images', 'back.png'))
+    @property
+    def back(self):
+        return card_images.back()
 
     # 显示正面
     def turn_face_up(self):
@@ -56,6 +71,13 @@ class Card(QGraphicsPixmapItem):
         self.side = constants.SIDE_BACK
         self.setPixmap(self.back)
 
+    # 尺寸变化后换上当前尺寸的图片
+    def refresh(self):
+        if self.side == constants.SIDE_FACE:
+            self.setPixmap(self.face)
+        elif self.side == constants.SIDE_BACK:
+            self.setPixmap(self.back)
+
     # 正面 -> True
     @property
     def is_face_up(self):
@@ -70,6 +92,7 @@ class Card(QGraphicsPixmapItem):
         # back & first -> turn face
         if not self.is_face_up and self.stack.cards[-1] == self:
             self.turn_face_up()
+            emit(self, FLIPPED)
             event.accept()
             return
         # stack & not first, 第一张下面的牌
@@ -88,25 +111,24 @@ class Card(QGraphicsPixmapItem):
     def mouseReleaseEvent(self, event):
         self.stack.deactivate()
 
-        items = self.collidingItems()  # 获取与当前项碰撞的图形项列表。
-        if items:
-            for item in items:
-                # 匹配
-                if (isinstance(item, Card) and item.stack != self.stack) or (
-                        isinstance(item, StackBase) and item != self.stack
-                ):
-                    if item.stack.is_valid_drop(self):
-                        cards = self.stack.remove_card(self)  # children for workstack
-                        item.stack.add_cards(cards)
-                        break
+        # 按重叠面积从大到小查找可落牌的栈, 不再逐个检测场景中的图形项
+        stacks = self.scene().dropzones.find(self.sceneBoundingRect(), exclude=self.stack)
+        for stack in stacks:
+            if stack.is_valid_drop(self):
+                source = self.stack
+                cards = self.stack.remove_card(self)  # children for workstack
+                stack.add_cards(cards)
+                emit(self, MOVED, source)
+                break
 
-        self.stack.update()
+        # 只重新摆放拖动的牌(及其上面的牌), 未落下时归位
+        self.stack.update(self.index)
 
         super().mouseReleaseEvent(event)
 
     def mouseDoubleClickEvent(self, event):
         if self.stack.is_free_card(self):
-            self.signals.doubleclicked.emit()
+            emit(self, DOUBLECLICKED)
             event.accept()
 
         super().mouseDoubleClickEvent(event)
@@ -121,6 +143,7 @@ class StackBase(QGraphicsRectItem):
         self.setZValue(-1)  # 栈位
 
         self.cards = []  # 卡牌表
+        self.zone = (0, 0, 0, 0)  # 落牌区域: 栈 + 栈顶牌, 场景坐标 (x1, y1, x2, y2)
 
         self.stack = self
         self.setup()
@@ -132,10 +155,27 @@ class StackBase(QGraphicsRectItem):
     def reset(self):
         self.remove_all_cards()
 
-    def update(self):
-        for n, card in enumerate(self.cards):
-            card.setPos(self.pos() + QPointF(n * self.offset_x, n * self.offset_y))
+    # 按缩放比例设置栈位大小和牌间距, 类属性是 1 倍时的值
+    def set_scale(self, scale, rect):
+        self.setRect(rect)
+        self.offset_x = type(self).offset_x * scale
+        self.offset_y = type(self).offset_y * scale
+
+    # 从 start 开始重新摆放, 前面的牌位置不变
+    def update(self, start=0):
+        pos = self.pos()
+        for n in range(start, len(self.cards)):
+            card = self.cards[n]
+            card.setPos(pos + QPointF(n * self.offset_x, n * self.offset_y))
             card.setZValue(n)
+        self.update_zone()
+
+    # 栈顶变化后更新落牌区域
+    def update_zone(self):
+        zone = self.sceneBoundingRect()
+        if self.cards:
+            zone = zone.united(self.cards[-1].sceneBoundingRect())
+        self.zone = zone.getCoords()
 
     def activate(self):
         pass
@@ -146,26 +186,39 @@ class StackBase(QGraphicsRectItem):
     # stackbase ->
     def add_card(self, card, update=True):
         card.stack = self  # 更新卡牌的当前所属栈
+        card.index = len(self.cards)
         self.cards.append(card)  # 更新该栈的卡牌堆
         if update:
-            self.update()
+            self.update(card.index)
 
+    # 批量加牌, 只摆放一次新加的牌
     def add_cards(self, cards):
+        start = len(self.cards)
         for card in cards:
             self.add_card(card, update=False)
-        self.update()  # 结束更新视图
+        self.update(start)  # 结束更新视图
 
     def remove_card(self, card):
         card.stack = None
-        self.cards.remove(card)
-        self.update()
+        index = card.index
+        # 取栈顶 O(1), 其余牌位置不变
+        if index == len(self.cards) - 1:
+            self.cards.pop()
+            self.update_zone()
+        else:
+            del self.cards[index]
+            for n in range(index, len(self.cards)):
+                self.cards[n].index = n
+            self.update(index)
         return [card]  # 返回孩子列表
 
     # 清空
     def remove_all_cards(self):
-        for card in self.cards[:]:
+        for card in self.cards:
             card.stack = None
+            card.index = None
         self.cards = []
+        self.update_zone()
 
     def is_valid_drop(self, card):
         return True
@@ -173,6 +226,11 @@ class StackBase(QGraphicsRectItem):
     def is_free_card(self, card):
         return False
 
+    # 栈顶牌的编号, 空栈 -> None
+    @property
+    def top_id(self):
+        return self.cards[-1].id if self.cards else None
+
 
 # 桥牌
 class DeckStack(StackBase):
@@ -191,8 +249,8 @@ class DeckStack(StackBase):
     # 在栈中放置桥牌
     def stack_cards(self, cards):
         for card in cards:
-            self.add_card(card)
             card.turn_back_up()
+        self.add_cards(cards)
 
     # 能否刷新回合
     def can_restack(self, n_rounds=3) -> bool:
@@ -211,10 +269,11 @@ class DeckStack(StackBase):
     def restack(self, fromstack):
         self.restack_counter += 1
 
-        for card in fromstack.cards[::-1]:
-            fromstack.remove_card(card)
-            self.add_card(card)
+        cards = fromstack.cards[::-1]
+        for card in cards:
+            fromstack.remove_card(card)  # 都是栈顶, O(1)
             card.turn_back_up()
+        self.add_cards(cards)
 
     # 取牌
     def take_top_card(self):
@@ -255,6 +314,7 @@ class DealStack(StackBase):
     def reset(self):
         super().reset()  # remove_all_cards
         self.spread_from = 0
+        self._spread_shown = 0
 
     # 禁止落牌
     def is_valid_drop(self, card):
@@ -264,15 +324,19 @@ class DealStack(StackBase):
     def is_free_card(self, card):
         return card == self.cards[-1]
 
-    # 更新视图
-    def update(self):
-        offset_x = 0
-        for n, card in enumerate(self.cards):
-            card.setPos(self.pos() + QPointF(offset_x, 0))
+    # 更新视图, spread_from 之后的牌依次展开
+    def update(self, start=0):
+        # 展开位置变了, 上一轮展开的牌要收回
+        if self.spread_from != self._spread_shown:
+            start = min(start, self.spread_from, self._spread_shown)
+            self._spread_shown = self.spread_from
+
+        pos = self.pos()
+        for n in range(start, len(self.cards)):
+            card = self.cards[n]
+            card.setPos(pos + QPointF(max(0, n - self.spread_from) * self.offset_x, 0))
             card.setZValue(n)
-
-            if n >= self.spread_from:
-                offset_x = offset_x + self.offset_x
+        self.update_zone()
 
 
 class WorkStack(StackBase):
@@ -287,21 +351,19 @@ class WorkStack(StackBase):
         brush = QBrush(color)
         self.setBrush(brush)
 
+    def set_scale(self, scale, rect):
+        super().set_scale(scale, rect)
+        self.offset_y_back = type(self).offset_y_back * scale
+
     def activate(self):
         self.setZValue(1000)
 
     def deactivate(self):
         self.setZValue(-1)
 
+    # 规则见 model.work_accepts: 空栈 | 颜色相反且点数小一
     def is_valid_drop(self, card):
-        # 该栈空
-        if not self.cards:
-            return True
-
-        if card.color != self.cards[-1].color and card.value == self.cards[-1].value - 1:
-            return True
-
-        return False
+        return model.work_accepts(self.top_id, card.id)
 
     # 自由牌: 正面必第一张
     def is_free_card(self, card):
@@ -316,32 +378,39 @@ class WorkStack(StackBase):
         super().add_card(card, update=update)
 
     def remove_card(self, card) -> List[Card]:
-        index = self.cards.index(card)
-        self.cards, cards = self.cards[:index], self.cards[index:]
+        index = card.index  # 不再 list.index 查找
+        cards = self.cards[index:]
+        del self.cards[index:]
 
         for card in cards:
             card.setParentItem(None)
             card.stack = None
 
-        self.update()
+        self.stack.setZValue(-1)
+        self.update_zone()
         return cards
 
     def remove_all_cards(self):
-        for card in self.cards[:]:
+        for card in self.cards:
             card.setParentItem(None)
             card.stack = None
+            card.index = None
         self.cards = []
+        self.update_zone()
 
-    def update(self):
+    # 位置相对父牌, 只需摆放 start 之后的牌
+    def update(self, start=0):
         self.stack.setZValue(-1)
-        offset_y = 0
-        for n, card in enumerate(self.cards):
-            card.setPos(QPointF(0, offset_y))
-
-            if card.is_face_up:
+        for n in range(start, len(self.cards)):
+            card = self.cards[n]
+            if n == 0:
+                offset_y = 0
+            elif self.cards[n - 1].is_face_up:
                 offset_y = self.offset_y
             else:
                 offset_y = self.offset_y_back
+            card.setPos(QPointF(0, offset_y))
+        self.update_zone()
 
 
 class DropStack(StackBase):
@@ -352,7 +421,6 @@ class DropStack(StackBase):
     value = 0
 
     def setup(self):
-        self.signals = Signals()
         color = QColor(Qt.GlobalColor.blue)
         color.setAlpha(50)
         pen = QPen(color)
@@ -364,12 +432,10 @@ class DropStack(StackBase):
         self.suit = None
         self.value = 0
 
+    # 规则见 model.drop_accepts: 空栈收A | 同花色且点数大一
+    # 只收单张, 从工作栈中间拖来的一串不能归栈
     def is_valid_drop(self, card):
-        if (self.suit is None or card.suit == self.suit) and \
-                (card.value == self.value + 1):
-            return True
-
-        return False
+        return card.stack.cards[-1] is card and model.drop_accepts(self.top_id, card.id)
 
     def add_card(self, card, update=True):
         super().add_card(card, update=update)
@@ -377,18 +443,53 @@ class DropStack(StackBase):
         self.value = self.cards[-1].value  # 栈顶值更新
 
         if self.is_complete:
-            self.signals.comlpete.emit()
+            emit(self, COMPLETE)
 
-    # 好像没用
+    # 撤销时使用, 花色和值跟随新的栈顶
     def remove_card(self, card):
-        super().remove_card(card)
+        cards = super().remove_card(card)
+        self.suit = self.cards[-1].suit if self.cards else None
         self.value = self.cards[-1].value if self.cards else 0
+        return cards
 
     @property
     def is_complete(self):
         return self.value == 13
 
 
+# 落牌区域索引, 13个栈各一个矩形, 随栈更新
+class DropZones:
+    def __init__(self):
+        self.stacks = []
+
+    def add(self, stack):
+        stack.update_zone()
+        self.stacks.append(stack)
+
+    # 与 rect 重叠的栈, 重叠面积大的在前
+    def find(self, rect, exclude=None):
+        left, top, right, bottom = rect.getCoords()
+        found = []
+        for stack in self.stacks:
+            if stack is exclude:
+                continue
+            x1, y1, x2, y2 = stack.zone
+            width = min(right, x2) - max(left, x1)
+            height = min(bottom, y2) - max(top, y1)
+            if width > 0 and height > 0:
+                found.append((width * height, stack))
+        found.sort(key=lambda item: item[0], reverse=True)
+        return [stack for _, stack in found]
+
+
+# 牌桌场景
+class Table(QGraphicsScene):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.dropzones = DropZones()
+        self.dispatcher = Dispatcher()  # 场景中所有卡牌和栈的事件
+
+
 # 发牌器
 class DealTrigger(QGraphicsRectItem):
     def __init__(self):
@@ -399,10 +500,8 @@ class DealTrigger(QGraphicsRectItem):
         pen = QPen(Qt.PenStyle.NoPen)
         self.setPen(pen)
 
-        self.signals = Signals()
-
     def mousePressEvent(self, event):
-        self.signals.clicked.emit()
+        emit(self, CLICKED)
 
 
 class AnimationCover(QGraphicsRectItem):
@@ -415,3 +514,26 @@ class AnimationCover(QGraphicsRectItem):
 
     def mousePressEvent(self, event):
         event.accept()  #
+
+
+# 提示框, 显示一段时间后自动隐藏
+class HintMarker(QGraphicsRectItem):
+    def __init__(self):
+        super().__init__()
+        self.setZValue(2000)
+        color = QColor(Qt.GlobalColor.yellow)
+        pen = QPen(color)
+        pen.setWidth(3)
+        self.setPen(pen)
+        self.setAcceptedMouseButtons(Qt.MouseButton.NoButton)  # 不挡住鼠标
+        self.hide()
+
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(constants.HINT_MS)
+        self.timer.timeout.connect(self.hide)
+
+    def show_rect(self, rect):
+        self.setRect(rect)
+        self.show()
+        self.timer.start()
@@ -0,0 +1,85 @@
+import math
+
+import constants
+from PySide6.QtCore import QPointF, QRectF, QSize
+
+# 牌桌布局: constants 中是 1 倍时的尺寸, 其它比例按比例换算
+# 比例取 SCALE_STEP 的整数倍, 尺寸种类少, 缩放后的卡牌图片缓存更容易命中
+
+TABLE_SIZE = constants.WINDOW_SIZE[0] - 10, constants.WINDOW_SIZE[1] - 50  # 场景大小
+NAME_POS = 170, 375  # 字样位置
+CHANCE_POS = 50, 520  # 胜率
+
+SCALE_STEP = 0.05
+MIN_SCALE = 0.5
+MAX_SCALE = 3.0
+
+
+def quantize(scale):
+    scale = max(MIN_SCALE, min(MAX_SCALE, scale))
+    return round(math.floor(scale / SCALE_STEP + 1e-9) * SCALE_STEP, 2)
+
+
+# 能完整放进 width x height 的比例
+def fit_scale(width, height):
+    return quantize(min(width / TABLE_SIZE[0], height / TABLE_SIZE[1]))
+
+
+class Layout:
+    def __init__(self, scale=1.0):
+        self.scale = scale
+
+    def __repr__(self):
+        return 'Layout(%r)' % self.scale
+
+    @property
+    def card_size(self):
+        return QSize(
+            round(constants.CARD_DIMENSIONS.width() * self.scale),
+            round(constants.CARD_DIMENSIONS.height() * self.scale),
+        )
+
+    @property
+    def card_rect(self):
+        return QRectF(0, 0, self.card_size.width(), self.card_size.height())
+
+    @property
+    def table_rect(self):
+        return QRectF(0, 0, TABLE_SIZE[0] * self.scale, TABLE_SIZE[1] * self.scale)
+
+    @property
+    def deal_rect(self):
+        rect = QRectF(constants.DEAL_RECT)
+        return QRectF(rect.topLeft() * self.scale, rect.size() * self.scale)
+
+    @property
+    def offset_x(self):
+        return constants.OFFSET_X * self.scale
+
+    @property
+    def offset_y(self):
+        return constants.OFFSET_Y * self.scale
+
+    @property
+    def card_spacing_x(self):
+        return constants.CARD_SPACING_X * self.scale
+
+    @property
+    def work_stack_y(self):
+        return constants.WORK_STACK_Y * self.scale
+
+    @property
+    def name_pos(self):
+        return QPointF(*NAME_POS) * self.scale
+
+    @property
+    def chance_pos(self):
+        return QPointF(*CHANCE_POS) * self.scale
+
+    # 第 n 列, 上面一排
+    def top_pos(self, n):
+        return QPointF(self.offset_x + self.card_spacing_x * n, self.offset_y)
+
+    # 第 n 个工作栈
+    def work_pos(self, n):
+        return QPointF(self.offset_x + self.card_spacing_x * n, self.work_stack_y)
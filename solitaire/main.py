@@ -1,69 +1,134 @@
 import os
 import random
 import sys
+import time
 
 import constants
+import estimate
+import moves
+import rendering
+import replay
+import savegame
+from animation import WinAnimation
+from assets import loader
+from cardimages import card_images
+from dealindex import DIFFICULTIES, DealIndex, index_path
+from framestats import FRAMESTATS_PATH, TableView
+from history import History
+from layout import Layout, fit_scale, quantize
 from items import (
+    CLICKED,
+    COMPLETE,
+    DOUBLECLICKED,
+    FLIPPED,
+    MOVED,
     AnimationCover,
     Card,
     DealStack,
     DealTrigger,
     DeckStack,
     DropStack,
+    HintMarker,
+    Table,
     WorkStack,
 )
-from PySide6.QtCore import QPoint, QPointF, QRectF, Qt, QTimer
-from PySide6.QtGui import QAction, QActionGroup, QBrush, QIcon, QPixmap
+from model import DEAL_CARDS, FLIP, MOVE, RESTACK, Game, shuffled_deck
+from replay import REPLAYS_PATH
+from stats import STATS_PATH, StatsStore, game_record
+from statsdialog import StatsDialog
+from PySide6.QtCore import Qt, QThreadPool, QTimer
+from PySide6.QtGui import QAction, QActionGroup, QBrush, QColor, QIcon, QKeySequence
 from PySide6.QtWidgets import (
     QApplication,
     QGraphicsPixmapItem,
-    QGraphicsScene,
-    QGraphicsView,
+    QGraphicsSimpleTextItem,
+    QInputDialog,
     QMainWindow,
     QMessageBox,
 )
 
 
 class MainWindow(QMainWindow):
-    def __init__(self):
+    def __init__(
+        self, resume=True, stats_path=STATS_PATH, replay_path=REPLAYS_PATH, resume_path=savegame.RESUME_PATH,
+    ):
         super().__init__()
+        # 图片在后台线程解码, 窗口先显示, 到了再换上
+        card_images.load_async(loader)
+
         # view初始化,设置
-        view = QGraphicsView()
-        view.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
-        view.setVerticalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
-        # scene初始化
-        self.scene = QGraphicsScene()
-        self.scene.setSceneRect(
-            QRectF(0, 0, constants.WINDOW_SIZE[0]-10, constants.WINDOW_SIZE[1] - 50)
-        )
-        # scene背景图片
-        felt = QBrush(QPixmap(os.path.join('images','felt.png')))
-        self.scene.setBackgroundBrush(felt)
+        self.view = view = TableView()
+        # scene初始化, 大小随窗口缩放, 见 set_scale
+        self.layout = Layout()
+        self.zoom = 1.0 # 相对适应窗口大小的缩放
+        self.pixel_ratio = 1.0 # 卡牌图片按此设备像素比缩放
+        self.scene = Table()
+        self.scene.setSceneRect(self.layout.table_rect)
+        # scene背景图片, 加载前先用台布的平均色
+        self.scene.setBackgroundBrush(QColor(constants.FELT_COLOR))
+        loader.load(os.path.join('images','felt.png'), self.set_felt)
         # scene字样
-        name = QGraphicsPixmapItem()
-        name.setPixmap(QPixmap(os.path.join('images','name.png')))
-        name.setPos(QPointF(170,375))
-        self.scene.addItem(name)
+        self.name = QGraphicsPixmapItem()
+        self.name_pixmap = None # 原始尺寸
+        loader.load(os.path.join('images','name.png'), self.set_name_pixmap)
+        self.name.setPos(self.layout.name_pos)
+        self.scene.addItem(self.name)
         # view -> scene
         view.setScene(self.scene)
 
-        self.timer = QTimer()
-        self.timer.setInterval(500) # 间隔0.5秒动一次
-        self.timer.timeout.connect(self.win_animation) # 信号写在这里
-
         self.animation_event_cover = AnimationCover()
         self.scene.addItem(self.animation_event_cover)
 
         menu = self.menuBar().addMenu('&Game')
 
-        deal_action = QAction(
-            QIcon(os.path.join('images','playing-card.png')),
-            'Deal...',
-            self,
-        )
+        deal_action = QAction('Deal...', self)
+        loader.load(os.path.join('images','playing-card.png'), lambda pixmap: deal_action.setIcon(QIcon(pixmap)))
         deal_action.triggered.connect(self.restart_game)
         menu.addAction(deal_action)
 
+        # 指定牌局号
+        number_action = QAction('Deal number...', self)
+        number_action.triggered.connect(self.choose_deal_number)
+        menu.addAction(number_action)
+
+        # 从牌局索引中挑选有解的牌局
+        self.winnable_menu = menu.addMenu('Winnable deal')
+        for bucket, name in enumerate(DIFFICULTIES):
+            action = QAction(name, self)
+            action.triggered.connect(lambda checked=False, b=bucket: self.deal_winnable(b))
+            self.winnable_menu.addAction(action)
+
+        menu.addSeparator()
+
+        # 撤销/重做
+        self.undo_action = QAction('Undo', self)
+        self.undo_action.setShortcut(QKeySequence.StandardKey.Undo)
+        self.undo_action.triggered.connect(self.undo)
+        menu.addAction(self.undo_action)
+
+        self.redo_action = QAction('Redo', self)
+        self.redo_action.setShortcut(QKeySequence.StandardKey.Redo)
+        self.redo_action.triggered.connect(self.redo)
+        menu.addAction(self.redo_action)
+
+        hint_action = QAction('Hint', self)
+        hint_action.setShortcut(QKeySequence('H'))
+        hint_action.triggered.connect(self.show_hint)
+        menu.addAction(hint_action)
+
+        # 所有牌翻开后自动归栈
+        self.autocomplete_action = QAction('Auto-complete', self)
+        self.autocomplete_action.setCheckable(True)
+        self.autocomplete_action.setChecked(True)
+        self.autocomplete_action.triggered.connect(self.check_autocomplete)
+        menu.addAction(self.autocomplete_action)
+
+        # 后台估计胜率, 显示在左下角
+        self.chance_action = QAction('Win chance', self)
+        self.chance_action.setCheckable(True)
+        self.chance_action.toggled.connect(self.toggle_chance)
+        menu.addAction(self.chance_action)
+
         menu.addSeparator()
 
         deal1_action = QAction('1 card', self)
@@ -83,6 +148,7 @@ class MainWindow(QMainWindow):
         dealgroup.addAction(deal1_action)
         dealgroup.addAction(deal3_action)
         dealgroup.setExclusive(True)
+        self.deal_actions = {1: deal1_action, 3: deal3_action}
 
         menu.addSeparator()
 
@@ -107,6 +173,40 @@ class MainWindow(QMainWindow):
         roundgroup.addAction(rounds5_action)
         roundgroup.addAction(roundsu_action)
         roundgroup.setExclusive(True)
+        self.rounds_actions = {3: rounds3_action, 5: rounds5_action, None: roundsu_action}
+
+        menu.addSeparator()
+
+        # 存档, 追加到 savegame.SAVES_PATH
+        save_action = QAction('Save game', self)
+        save_action.setShortcut(QKeySequence.StandardKey.Save)
+        save_action.triggered.connect(self.save_game)
+        menu.addAction(save_action)
+
+        load_action = QAction('Load saved game', self)
+        load_action.setShortcut(QKeySequence.StandardKey.Open)
+        load_action.triggered.connect(self.load_game)
+        menu.addAction(load_action)
+
+        # 录像, 每局结束追加到 replay_path
+        replay_action = QAction('Replay last game', self)
+        replay_action.triggered.connect(self.replay_last_game)
+        menu.addAction(replay_action)
+
+        speed_menu = menu.addMenu('Replay speed')
+        speedgroup = QActionGroup(self)
+        speedgroup.setExclusive(True)
+        for speed in constants.REPLAY_SPEEDS:
+            action = QAction('%gx' % speed, self)
+            action.setCheckable(True)
+            action.setChecked(speed == 1)
+            action.triggered.connect(lambda checked, speed=speed: self.set_replay_speed(speed))
+            speed_menu.addAction(action)
+            speedgroup.addAction(action)
+
+        stats_action = QAction('Statistics...', self)
+        stats_action.triggered.connect(self.show_stats)
+        menu.addAction(stats_action)
 
         menu.addSeparator()
 
@@ -114,10 +214,78 @@ class MainWindow(QMainWindow):
         quit_action.triggered.connect(self.quit)
         menu.addAction(quit_action)
 
+        # 性能统计, 默认关闭
+        view_menu = self.menuBar().addMenu('&View')
+
+        self.overlay_action = QAction('Performance overlay', self)
+        self.overlay_action.setShortcut('F12')
+        self.overlay_action.setCheckable(True)
+        self.overlay_action.toggled.connect(self.toggle_overlay)
+        view_menu.addAction(self.overlay_action)
+
+        self.dump_stats_action = QAction('Dump frame stats', self)
+        self.dump_stats_action.setEnabled(False)
+        self.dump_stats_action.triggered.connect(self.dump_frame_stats)
+        view_menu.addAction(self.dump_stats_action)
+
+        view_menu.addSeparator()
+
+        # 缩放, 在适应窗口大小的基础上
+        zoom_in_action = QAction('Zoom in', self)
+        zoom_in_action.setShortcut(QKeySequence.StandardKey.ZoomIn)
+        zoom_in_action.triggered.connect(lambda: self.set_zoom(self.zoom + constants.ZOOM_STEP))
+        view_menu.addAction(zoom_in_action)
+
+        zoom_out_action = QAction('Zoom out', self)
+        zoom_out_action.setShortcut(QKeySequence.StandardKey.ZoomOut)
+        zoom_out_action.triggered.connect(lambda: self.set_zoom(self.zoom - constants.ZOOM_STEP))
+        view_menu.addAction(zoom_out_action)
+
+        zoom_fit_action = QAction('Fit to window', self)
+        zoom_fit_action.setShortcut('Ctrl+0')
+        zoom_fit_action.triggered.connect(lambda: self.set_zoom(1.0))
+        view_menu.addAction(zoom_fit_action)
+
+        view_menu.addSeparator()
+
+        # 渲染配置, 见 rendering.PROFILES
+        profilegroup = QActionGroup(self)
+        profilegroup.setExclusive(True)
+        self.profile_actions = {}
+        for name in rendering.PROFILES:
+            action = QAction('%s rendering' % name.capitalize(), self)
+            action.setCheckable(True)
+            action.triggered.connect(lambda checked, name=name: self.set_rendering_profile(name))
+            view_menu.addAction(action)
+            profilegroup.addAction(action)
+            self.profile_actions[name] = action
+        self.profile_actions[rendering.DEFAULT].setChecked(True)
+
         # 牌堆
         self.deck = []
         self.deal_n = 3 # 每轮发牌数
         self.rounds_n = 3 # 回合数
+        self.seed = None # 牌局号
+        self.deal_index = None # 当前设置的牌局索引
+        self.history = History() # 撤销记录
+
+        # 关闭时的牌局, resume 为 False 时启动不读取, resume_path 为 None 时不读也不写
+        self.resume_path = resume_path
+
+        # 战绩, stats_path 为 None 时不记录
+        self.stats = StatsStore(stats_path) if stats_path else None
+        self.game_started = 0.0 # time.monotonic()
+        self.move_count = 0
+        self.game_finished = True # 已记入战绩
+
+        # 录像, replay_path 为 None 时不保存
+        self.replay_path = replay_path
+        self.recorder = None # 当前一局, 回放时为 None
+        self.replay_ops = [] # 回放中剩下的操作, 倒序
+        self.replay_speed = 1
+        self.replay_timer = QTimer()
+        self.replay_timer.setInterval(constants.REPLAY_MS)
+        self.replay_timer.timeout.connect(self.replay_step)
 
         # 牌堆加牌
         for suit in constants.SUITS:
@@ -125,16 +293,16 @@ class MainWindow(QMainWindow):
                 card = Card(value, suit)
                 self.deck.append(card)
                 self.scene.addItem(card)
-                card.signals.doubleclicked.connect( # 信号写在这里
-                    lambda card=card: self.auto_drop_card(card)
-                )
+        # 卡牌和栈的事件都从这里来
+        self.scene.dispatcher.item_event.connect(self.dispatch)
 
         self.setCentralWidget(view)
-        self.setFixedSize(*constants.WINDOW_SIZE)
+        self.resize(*constants.WINDOW_SIZE)
+        self.setMinimumSize(constants.WINDOW_SIZE[0] // 2, constants.WINDOW_SIZE[1] // 2)
 
         # 桥牌堆
         self.deckstack = DeckStack()
-        self.deckstack.setPos(constants.OFFSET_X, constants.OFFSET_Y)
+        self.deckstack.setPos(self.layout.top_pos(0))
         self.scene.addItem(self.deckstack)
 
         # 工作栈
@@ -142,10 +310,7 @@ class MainWindow(QMainWindow):
 
         for n in range(7):
             stack = WorkStack()
-            stack.setPos(
-                constants.OFFSET_X + constants.CARD_SPACING_X * n,
-                constants.WORK_STACK_Y,
-            )
+            stack.setPos(self.layout.work_pos(n))
             self.scene.addItem(stack)
             self.works.append(stack)
 
@@ -154,32 +319,132 @@ class MainWindow(QMainWindow):
 
         for n in range(4):
             stack = DropStack()
-            stack.setPos(
-                constants.OFFSET_X + constants.CARD_SPACING_X * (3 + n),
-                constants.OFFSET_Y,
-            )
-            stack.signals.comlpete.connect(self.check_win_condition) # 信号写在这里
+            stack.setPos(self.layout.top_pos(3 + n))
 
             self.scene.addItem(stack)
             self.drops.append(stack)
 
         # 发牌栈
         self.dealstack = DealStack()
-        self.dealstack.setPos(
-            constants.OFFSET_X + constants.CARD_SPACING_X, constants.OFFSET_Y
-        )
+        self.dealstack.setPos(self.layout.top_pos(1))
         self.scene.addItem(self.dealstack)
 
+        # 全部栈, 顺序同 model 中的栈编号
+        self.stacks = [self.deckstack, self.dealstack] + self.works + self.drops
+        for stack in self.stacks:
+            self.scene.dropzones.add(stack)
+
         # 发牌器
-        dealtrigger = DealTrigger()
-        dealtrigger.signals.clicked.connect(self.deal) # 信号写在这里
-        self.scene.addItem(dealtrigger)
+        self.dealtrigger = DealTrigger()
+        self.scene.addItem(self.dealtrigger)
+
+        # 按编号排列, 洗牌时按编号取牌
+        self.cards = sorted(self.deck, key=lambda card: card.id)
+
+        # 胜利动画
+        self.animation = WinAnimation(self.cards, self.drops)
+
+        # 提示框: 要移动的牌, 目标位置
+        self.hint_markers = [HintMarker(), HintMarker()]
+        for marker in self.hint_markers:
+            self.scene.addItem(marker)
+
+        self.autocomplete_timer = QTimer()
+        self.autocomplete_timer.setInterval(constants.AUTOCOMPLETE_MS)
+        self.autocomplete_timer.timeout.connect(self.autocomplete_step)
+
+        # 胜率估计, 单线程, 走牌后取消旧任务, 停顿片刻再开始新的
+        self.chance_label = QGraphicsSimpleTextItem()
+        self.chance_label.setBrush(QColor(Qt.GlobalColor.white))
+        self.chance_label.setZValue(1500)
+        self.chance_label.setPos(self.layout.chance_pos)
+        self.chance_label.hide()
+        self.scene.addItem(self.chance_label)
+
+        self.estimate_pool = QThreadPool()
+        self.estimate_pool.setMaxThreadCount(1)
+        self.estimate_signals = estimate.Signals()
+        self.estimate_signals.progress.connect(self.show_chance)
+        self.estimate_task = None
+        self.estimate_generation = 0 # 丢弃旧任务的结果
+
+        # 提示在全局线程池中求解, 不阻塞界面; 牌局变化后到达的结果丢弃
+        self.estimate_signals.hint.connect(self.show_hint_result)
+        self.hint_generation = 0
+        self.hint_pending = False
+
+        self.estimate_timer = QTimer()
+        self.estimate_timer.setSingleShot(True)
+        self.estimate_timer.setInterval(constants.ESTIMATE_DELAY_MS)
+        self.estimate_timer.timeout.connect(self.start_estimate)
+
+        self.load_deal_index()
+        # 继续上次关闭时的牌局
+        if not (resume and self.resume_game()):
+            self.shuffle_and_stack()
 
-        self.shuffle_and_stack()
-        
-        self.setWindowTitle("Saltaire")
         self.show()
 
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.fit_to_window()
+
+    # 按窗口大小和缩放计算比例, 不含滚动条
+    def fit_to_window(self):
+        size = self.view.maximumViewportSize()
+        self.set_scale(quantize(fit_scale(size.width(), size.height()) * self.zoom))
+
+    # menu.zoom_*_action ->
+    def set_zoom(self, zoom):
+        self.zoom = min(max(zoom, constants.ZOOM_MIN), constants.ZOOM_MAX)
+        self.fit_to_window()
+
+    # 按比例重新摆放: 栈位, 牌间距, 卡牌图片都换成目标尺寸, 不用 view 变换
+    def set_scale(self, scale):
+        ratio = self.view.devicePixelRatioF()
+        if scale == self.layout.scale and ratio == self.pixel_ratio:
+            return
+
+        self.layout = layout = Layout(scale)
+        self.pixel_ratio = ratio
+        self.scene.setSceneRect(layout.table_rect)
+        self.animation_event_cover.setRect(layout.table_rect)
+        self.dealtrigger.setRect(layout.deal_rect)
+        self.name.setPos(layout.name_pos)
+        self.chance_label.setPos(layout.chance_pos)
+        self.chance_label.setScale(scale)
+        self.set_name_pixmap(self.name_pixmap)
+
+        self.deckstack.setPos(layout.top_pos(0))
+        self.dealstack.setPos(layout.top_pos(1))
+        for n, stack in enumerate(self.works):
+            stack.setPos(layout.work_pos(n))
+        for n, stack in enumerate(self.drops):
+            stack.setPos(layout.top_pos(3 + n))
+
+        card_images.set_size(layout.card_size, ratio)
+        for card in self.cards:
+            card.refresh()
+        for stack in self.stacks:
+            stack.set_scale(scale, layout.card_rect)
+            stack.update()
+        self.animation.set_scale(scale)
+
+        self.view.resetCachedContent()
+
+    def set_name_pixmap(self, pixmap):
+        self.name_pixmap = pixmap
+        if pixmap is None:
+            return
+        if self.layout.scale != 1:
+            size = pixmap.size() * self.layout.scale
+            pixmap = pixmap.scaled(size, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
+        self.name.setPixmap(pixmap)
+
+    def set_felt(self, pixmap):
+        self.scene.setBackgroundBrush(QBrush(pixmap))
+        self.view.resetCachedContent()  # performance 配置缓存了背景
+
     # menu.deal_action ->
     # 弹窗询问
     def restart_game(self):
@@ -197,27 +462,282 @@ class MainWindow(QMainWindow):
     def quit(self):
         self.close()
 
+    # 关闭时保存牌局到 resume_path, 下次启动继续
+    def closeEvent(self, event):
+        if self.resume_path is not None:
+            if self.animation.is_active() or all(stack.is_complete for stack in self.drops):
+                if os.path.exists(self.resume_path):
+                    os.remove(self.resume_path)
+            else:
+                try:
+                    savegame.write(self.resume_path, self.game_state(), self.seed)
+                except OSError:
+                    pass  # 保存失败也要继续关闭, 录像和战绩照常写入
+        self.save_replay()
+        if self.stats:
+            self.stats.close()
+            self.stats = None
+        self.cancel_estimate()
+        self.estimate_pool.waitForDone()
+        QThreadPool.globalInstance().waitForDone()
+        super().closeEvent(event)
+
+    def resume_game(self):
+        if self.resume_path is None:
+            return False
+        try:
+            game, seed = savegame.read(self.resume_path)
+        except (OSError, ValueError):
+            return False
+        self.restore(game, seed)
+        return True
+
+    # menu.save_action ->
+    def save_game(self):
+        if not self.animation.is_active():
+            savegame.append(savegame.SAVES_PATH, self.game_state(), self.seed)
+
+    # menu.load_action ->
+    def load_game(self):
+        try:
+            game, seed = savegame.read_record(savegame.SAVES_PATH)
+        except (OSError, ValueError, IndexError) as e:
+            QMessageBox.warning(self, 'Load saved game', 'Could not load a saved game: %s' % e)
+            return
+        self.restore(game, seed)
+
+    # menu.overlay_action ->
+    def toggle_overlay(self, enabled):
+        self.view.set_instrumented(enabled)
+        self.dump_stats_action.setEnabled(enabled)
+
+    # menu.profile_actions ->
+    def set_rendering_profile(self, name):
+        rendering.apply_profile(self.view, name)
+        self.profile_actions[name].setChecked(True)
+
+    # menu.dump_stats_action ->
+    def dump_frame_stats(self):
+        if self.view.stats is None:
+            return
+        try:
+            self.view.stats.dump(FRAMESTATS_PATH)
+        except OSError as e:
+            QMessageBox.warning(self, 'Dump frame stats', 'Could not write %s: %s' % (FRAMESTATS_PATH, e))
+            return
+        QMessageBox.information(self, 'Dump frame stats', 'Frame stats written to %s' % FRAMESTATS_PATH)
+
+    # menu.stats_action ->
+    def show_stats(self):
+        if self.stats is None:
+            return
+        StatsDialog(self.stats, self).exec()
+
+    def start_game(self):
+        self.game_started = time.monotonic()
+        self.move_count = 0
+        self.game_finished = False
+        self.recorder = replay.Recorder(self.game_state(), self.seed)
+
+    # 赢了, 或者走过棋后换了牌局, 记一局; 写入在后台线程
+    def finish_game(self, won):
+        if self.game_finished or not (won or self.move_count):
+            return
+        self.game_finished = True
+        if self.stats is None:
+            return
+        self.stats.add(game_record(
+            self.seed, self.deal_n, self.rounds_n, self.move_count,
+            time.monotonic() - self.game_started, won, self.deckstack.restack_counter,
+        ))
+
+    # 当前一局的录像追加到 replay_path, 每局只写一次
+    # 换牌局或关闭时才写: 归栈最后一张牌时 comlpete 信号先于记录这一步
+    def save_replay(self):
+        recorder, self.recorder = self.recorder, None
+        if self.replay_path is None or not recorder:
+            return
+        try:
+            replay.append(self.replay_path, recorder)
+        except OSError:
+            pass  # 录像不影响游戏
+
+    # menu.replay_action ->
+    # 当前一局走过棋时回放这一局(restore 时追加到文件), 否则回放文件中的最后一局
+    def replay_last_game(self):
+        try:
+            if self.recorder:
+                game, seed, ops = self.recorder.decode()
+            else:
+                game, seed, ops = replay.read_last(self.replay_path or REPLAYS_PATH)
+            replay.play(game.copy(), ops)  # 先按规则检查一遍
+        except (OSError, ValueError, IndexError) as e:
+            QMessageBox.warning(self, 'Replay last game', 'Could not load a replay: %s' % e)
+            return
+        self.restore(game, seed)
+        self.recorder = None
+        self.game_finished = True # 回放不记战绩
+        self.replay_ops = ops[::-1]
+        self.animation_event_cover.show() # 回放时不能操作
+        self.replay_timer.start()
+        self.update_history_actions()
+
+    # menu.speed_actions ->
+    def set_replay_speed(self, speed):
+        self.replay_speed = speed
+        self.replay_timer.setInterval(round(constants.REPLAY_MS / speed))
+
+    def stop_replay(self):
+        if self.replay_timer.isActive():
+            self.replay_timer.stop()
+            self.replay_ops = []
+            if not self.animation.is_active():
+                self.animation_event_cover.hide()
+            self.update_history_actions()
+
+    # self.replay_timer.timeout ->
+    # 走一步, 和玩家操作走同样的路径
+    def replay_step(self):
+        if not self.replay_ops:
+            self.stop_replay()
+            return
+        op = self.replay_ops.pop()
+        kind = op[0]
+        if kind == MOVE:
+            _, src, dst, n = op
+            self.move_cards(self.stacks[src], self.stacks[dst], n)
+            self.record(op)
+        elif kind == FLIP:
+            stack = self.stacks[op[1]]
+            stack.cards[-1].turn_face_up()
+            stack.update(len(stack.cards) - 1)
+            self.record(op)
+        elif kind == replay.DEAL:
+            self.deal()
+        elif kind == replay.UNDO:
+            self.undo()
+        elif kind == replay.REDO:
+            self.redo()
+        else:
+            _, deal_n, rounds_n = op
+            self.set_deal_n(deal_n)
+            self.set_rounds_n(rounds_n)
+
+    # 把模型中的牌局直接放到现有的卡牌和栈上, 不重建场景
+    def restore(self, game, seed):
+        self.stop_replay()
+        self.finish_game(False)
+        self.save_replay()
+        self.animation.stop()
+        self.autocomplete_timer.stop()
+        self.animation_event_cover.hide()
+
+        for stack in self.stacks:
+            stack.reset()
+
+        for stack, ids in zip(self.stacks, game.stacks):
+            cards = [self.cards[n] for n in ids]
+            # 先翻面, 工作栈的摆放依赖下面一张牌的正反
+            for card in cards:
+                if game.face_up[card.id]:
+                    card.turn_face_up()
+                else:
+                    card.turn_back_up()
+            stack.add_cards(cards)
+
+        self.deckstack.restack_counter = game.restack_counter
+        self.dealstack.spread_from = game.spread_from
+        self.dealstack.update()
+
+        self.deal_n = game.deal_n
+        self.rounds_n = game.rounds_n
+        for actions, value in ((self.deal_actions, self.deal_n), (self.rounds_actions, self.rounds_n)):
+            if value in actions:
+                actions[value].setChecked(True)
+        self.deckstack.update_stack_status(self.rounds_n)
+        self.load_deal_index()
+
+        self.seed = seed
+        self.setWindowTitle("Saltaire #%d" % seed)
+
+        self.history.clear()
+        self.update_history_actions()
+        self.start_game()
+
+    # menu.number_action ->
+    def choose_deal_number(self):
+        seed, ok = QInputDialog.getInt(
+            self, 'Deal number', 'Deal number:', self.seed or 0, 0, 2 ** 31 - 1,
+        )
+        if ok:
+            self.shuffle_and_stack(seed)
+
+    # menu.winnable_menu ->
+    def deal_winnable(self, bucket):
+        seed = self.deal_index.pick(bucket) if self.deal_index else None
+        if seed is None:
+            QMessageBox.information(
+                self,
+                'Winnable deal',
+                'No %s deals are indexed for these settings.' % DIFFICULTIES[bucket].lower(),
+            )
+            return
+
+        self.shuffle_and_stack(seed)
+
+    # 加载当前设置对应的牌局索引
+    def load_deal_index(self):
+        if self.deal_index:
+            self.deal_index.close()
+            self.deal_index = None
+
+        path = index_path(self.deal_n, self.rounds_n)
+        if os.path.exists(path):
+            self.deal_index = DealIndex(path)
+        self.winnable_menu.setEnabled(self.deal_index is not None)
+
     # menu.deal_action->
+    # 牌局中途改设置记入录像, 回放时之后的发牌按新设置
     def set_deal_n(self, n):
+        if self.recorder is not None and n != self.deal_n:
+            self.recorder.settings(n, self.rounds_n)
         self.deal_n = n
+        if n in self.deal_actions:
+            self.deal_actions[n].setChecked(True)
+        self.load_deal_index()
+        self.restart_estimate()
 
     # menu.round_action->
     def set_rounds_n(self, n):
+        if self.recorder is not None and n != self.rounds_n:
+            self.recorder.settings(self.deal_n, n)
         self.rounds_n = n
+        if n in self.rounds_actions:
+            self.rounds_actions[n].setChecked(True)
         self.deckstack.update_stack_status(self.rounds_n)
+        self.load_deal_index()
+        self.restart_estimate()
 
-    # 洗牌
-    def shuffle_and_stack(self):
+    # 洗牌, seed 为牌局号, 不指定则随机
+    def shuffle_and_stack(self, seed=None):
+        self.stop_replay()
+        self.finish_game(False)
+        self.save_replay()
         # 停止动画
-        self.timer.stop()
+        self.animation.stop()
+        self.autocomplete_timer.stop()
         self.animation_event_cover.hide()
 
         # 重置栈
-        for stack in [self.deckstack, self.dealstack] + self.drops + self.works:
+        for stack in self.stacks:
             stack.reset()
 
-        # 洗牌, random.shuffle()仅打乱顺序
-        random.shuffle(self.deck)
+        # 洗牌, 同一牌局号洗出的牌相同
+        if seed is None:
+            seed = random.randrange(2 ** 31)
+        self.seed = seed
+        self.deck = [self.cards[n] for n in shuffled_deck(seed)]
+        self.setWindowTitle("Saltaire #%d" % seed)
 
         # 为了不改动deck，copy一份卡牌
         cards = self.deck[:] # 浅拷贝
@@ -234,75 +754,276 @@ class MainWindow(QMainWindow):
         # 剩下的放deckstack
         self.deckstack.stack_cards(cards) # add_card
 
-    # dealtrigger.signals.clicked->
+        self.history.clear()
+        self.update_history_actions()
+        self.start_game()
+
+    # 当前牌局的无界面模型
+    def game_state(self):
+        return Game.from_window(self)
+
+    # dispatch: dealtrigger CLICKED ->
     def deal(self):
+        command = self.deal_cards()
+        if command:
+            self.record(command)
+
+    # 发牌或重洗, 返回操作记录
+    def deal_cards(self):
         if self.deckstack.cards:
-            self.dealstack.spread_from = len(self.dealstack.cards) # dealstack的cards
-            for n in range(self.deal_n):
-                card = self.deckstack.take_top_card()
-                if card:
-                    self.dealstack.add_card(card)
-                    card.turn_face_up()
+            return self.deal_from_deck(self.deal_n)
         # deck栈空
         elif self.deckstack.can_restack(self.rounds_n):
-            self.deckstack.restack(self.dealstack) # 重置回合
-            self.deckstack.update_stack_status(self.rounds_n) # color
+            return self.restack_deck()
+
+    # 从牌堆发 n 张, 不足时发完为止; 重做时 n 取自记录, 不受当前设置影响
+    def deal_from_deck(self, n):
+        spread_from = self.dealstack.spread_from
+        self.dealstack.spread_from = len(self.dealstack.cards) # dealstack的cards
+        cards = []
+        for _ in range(n):
+            card = self.deckstack.take_top_card()
+            if card:
+                card.turn_face_up()
+                cards.append(card)
+        self.dealstack.add_cards(cards) # 一次摆放
+        return DEAL_CARDS, len(cards), spread_from
 
-    # card.signals.doubleclicked->
+    def restack_deck(self):
+        n_cards = len(self.dealstack.cards)
+        self.deckstack.restack(self.dealstack) # 重置回合
+        self.deckstack.update_stack_status(self.rounds_n) # color
+        return RESTACK, n_cards
+
+    # scene.dispatcher.item_event ->
+    def dispatch(self, item, event, arg):
+        if event == DOUBLECLICKED:
+            self.auto_drop_card(item)
+        elif event == MOVED:
+            self.card_moved(arg, item.stack, len(item.stack.cards) - item.index)
+        elif event == FLIPPED:
+            self.card_flipped(item.stack)
+        elif event == COMPLETE:
+            self.check_win_condition()
+        elif event == CLICKED:
+            self.deal()
+
+    # dispatch: card DOUBLECLICKED ->
+    # 只有栈顶的牌能自动归栈, 否则压在上面的牌会脱离牌栈
     def auto_drop_card(self, card):
-        for stack in self.drops:
-            if stack.is_valid_drop(card):
-                card.stack.remove_card(card)
-                stack.add_card(card)
-                break
+        source = card.stack
+        if source.cards[-1] is not card:
+            return
+
+        # 查表: 需要的栈顶 -> 归栈
+        n = moves.drop_index([stack.top_id for stack in self.drops], card.id)
+        if n is not None:
+            stack = self.drops[n]
+            source.remove_card(card)
+            stack.add_card(card)
+            self.card_moved(source, stack, 1)
+
+    # dispatch: card MOVED ->
+    def card_moved(self, source, target, n):
+        self.record((MOVE, self.stacks.index(source), self.stacks.index(target), n))
+
+    # dispatch: card FLIPPED ->
+    def card_flipped(self, stack):
+        self.record((FLIP, self.stacks.index(stack)))
+
+    def record(self, command):
+        if self.recorder is not None:
+            self.recorder.add(command)
+        self.move_count += 1
+        self.history.push(command)
+        self.finish_if_won()
+        self.update_history_actions()
+        self.check_autocomplete()
+
+    # 赢了记一局; 最后一张牌归栈时 COMPLETE 先于记录这一步, 所以在记录之后调用, 步数包含这一步
+    def finish_if_won(self):
+        if all(stack.is_complete for stack in self.drops):
+            self.finish_game(True)
+
+    # menu.hint_action ->
+    def show_hint(self):
+        if self.animation.is_active() or self.hint_pending:
+            return
+        self.hint_pending = True
+        QThreadPool.globalInstance().start(
+            estimate.HintTask(self.game_state(), self.hint_generation, self.estimate_signals),
+        )
+
+    # estimate_signals.hint ->
+    def show_hint_result(self, generation, hint):
+        self.hint_pending = False
+        if generation != self.hint_generation or self.animation.is_active():
+            return
+
+        if hint is None:
+            QMessageBox.information(self, 'Hint', 'No moves left.')
+            return
+
+        kind = hint[0]
+        if kind == 'flip':
+            rects = [self.stacks[hint[1]].cards[-1].sceneBoundingRect()]
+        elif kind == 'move':
+            _, src, index, dst = hint
+            cards = self.stacks[src].cards
+            target = self.stacks[dst].cards[-1] if self.stacks[dst].cards else self.stacks[dst]
+            rects = [
+                cards[index].sceneBoundingRect().united(cards[-1].sceneBoundingRect()),
+                target.sceneBoundingRect(),
+            ]
+        else:
+            rects = [self.deckstack.sceneBoundingRect()]
+
+        for marker, rect in zip(self.hint_markers, rects):
+            marker.show_rect(rect)
+
+    # menu.autocomplete_action ->
+    def check_autocomplete(self):
+        if (
+            self.autocomplete_action.isChecked()
+            and not self.replay_timer.isActive() # 录像里已有自动完成的步骤
+            and not self.deckstack.cards
+            and not self.dealstack.cards
+            and not self.autocomplete_timer.isActive()
+            and not self.animation.is_active()
+            and moves.can_autocomplete(self.game_state())
+        ):
+            self.autocomplete_timer.start()
+
+    # self.autocomplete_timer.timeout ->
+    def autocomplete_step(self):
+        batch = moves.autocomplete(self.game_state(), constants.AUTOCOMPLETE_BATCH)
+        if not batch or self.animation.is_active():
+            self.autocomplete_timer.stop()
+            return
+
+        # 和玩家走牌一样记录, 计入步数
+        for src, index, dst in batch:
+            self.move_cards(self.stacks[src], self.stacks[dst], 1)
+            self.record((MOVE, src, dst, 1))
+
+    # 每次牌局变化后调用
+    def update_history_actions(self):
+        self.hint_generation += 1
+        replaying = self.replay_timer.isActive()
+        self.undo_action.setEnabled(self.history.can_undo() and not replaying)
+        self.redo_action.setEnabled(self.history.can_redo() and not replaying)
+        self.restart_estimate()
+
+    # menu.chance_action ->
+    def toggle_chance(self, enabled):
+        self.chance_label.setVisible(enabled)
+        self.restart_estimate()
+
+    def cancel_estimate(self):
+        self.estimate_timer.stop()
+        if self.estimate_task:
+            self.estimate_task.cancel()
+            self.estimate_task = None
+        self.estimate_generation += 1
+
+    # 走牌后立即取消, 停顿 ESTIMATE_DELAY_MS 后重新估计
+    def restart_estimate(self):
+        self.cancel_estimate()
+        if self.chance_action.isChecked():
+            self.chance_label.setText('Win chance ...')
+            self.estimate_timer.start()
+
+    def start_estimate(self):
+        if self.animation.is_active() or all(stack.is_complete for stack in self.drops):
+            self.chance_label.setText('')
+            return
+        self.estimate_task = estimate.EstimateTask(
+            self.game_state(), self.estimate_generation, constants.ESTIMATE_SAMPLES, self.estimate_signals,
+        )
+        self.estimate_pool.start(self.estimate_task)
+
+    # estimate_signals.progress ->
+    def show_chance(self, generation, wins, total):
+        if generation != self.estimate_generation:
+            return
+        self.chance_label.setText('Win chance {:.0%} ±{:.0%} ({} games)'.format(
+            wins / total, estimate.margin(wins, total), total,
+        ))
+
+    # menu.undo_action ->
+    def undo(self):
+        self.autocomplete_timer.stop()
+        # 胜利动画中不能撤销
+        if self.animation.is_active() or not self.history.can_undo():
+            return
+
+        command = self.history.undo()
+        kind = command[0]
+        if kind == MOVE:
+            _, src, dst, n = command
+            self.move_cards(self.stacks[dst], self.stacks[src], n)
+        elif kind == FLIP:
+            stack = self.stacks[command[1]]
+            stack.cards[-1].turn_back_up()
+            stack.update(len(stack.cards) - 1)
+        elif kind == DEAL_CARDS:
+            _, n, spread_from = command
+            cards = self.dealstack.cards[:-n - 1:-1]
+            for card in cards:
+                self.dealstack.remove_card(card)
+                card.turn_back_up()
+            self.deckstack.add_cards(cards)
+            self.dealstack.spread_from = spread_from
+            self.dealstack.update(len(self.dealstack.cards))
+        elif kind == RESTACK:
+            cards = self.deckstack.cards[::-1]
+            for card in cards:
+                self.deckstack.remove_card(card)
+                card.turn_face_up()
+            self.dealstack.add_cards(cards)
+            self.deckstack.restack_counter -= 1
+            self.deckstack.update_stack_status(self.rounds_n)
+
+        if self.recorder is not None:
+            self.recorder.undo()
+        self.update_history_actions()
+
+    # menu.redo_action ->
+    # 按记录重做, 中途改了发牌数或回合数也和原来的操作一样
+    def redo(self):
+        if self.animation.is_active() or not self.history.can_redo():
+            return
+
+        command = self.history.redo()
+        kind = command[0]
+        if kind == MOVE:
+            _, src, dst, n = command
+            self.move_cards(self.stacks[src], self.stacks[dst], n)
+        elif kind == FLIP:
+            self.stacks[command[1]].cards[-1].turn_face_up()
+        elif kind == DEAL_CARDS:
+            self.deal_from_deck(command[1])
+        else:
+            self.restack_deck()
+
+        if self.recorder is not None:
+            self.recorder.redo()
+        self.finish_if_won()
+        self.update_history_actions()
+
+    # 把 source 顶部 n 张牌移到 target, 不检查规则
+    def move_cards(self, source, target, n):
+        cards = source.remove_card(source.cards[-n])
+        target.add_cards(cards)
 
-    # stack.signals.comlpete->
+    # dispatch: dropstack COMPLETE ->
+    # 只开始胜利动画, 战绩由 finish_if_won 在记录最后一步之后写入
     def check_win_condition(self):
         # 全部完整 -> True
         complete = all(s.is_complete for s in self.drops)
         if complete:
             self.animation_event_cover.show()
-            self.timer.start()
-
-    # self.timer.timeout
-    def win_animation(self):
-        # 从左到右,每次取一张
-        for drop in self.drops:
-            if drop.cards:
-                card = drop.cards.pop() # 不是remove, card.stack 仍为 dropstack
-                # 设置向量,左上
-                if card.vector is None:
-                    card.vector = QPoint(-random.randint(3, 10), -random.randint(0, 10))
-                    break
-
-        # 有向量的卡牌
-        for card in self.deck:
-            if card.vector is not None:
-
-                # 朝向量方向移动
-                card.setPos(card.pos() + card.vector)
-                # 对向量施加重力
-                card.vector += QPoint(0, 1) # Gravity
-                # 卡牌到底
-                if (
-                    card.pos().y()
-                    > constants.WINDOW_SIZE[1] - constants.CARD_DIMENSIONS.height()
-                ):
-                    # 重置向量
-                    card.vector = QPoint(
-                        card.vector.x(),
-                        # 损失能量，还是会因为重力降下来
-                        -max(1,int(card.vector.y() * constants.BOUNCE_ENERGY)),
-                    )
-                    # 更新一下位置
-                    card.setPos(
-                        card.pos().x(),
-                        constants.WINDOW_SIZE[1] -constants.CARD_DIMENSIONS.height()
-                    )
-                # 卡牌触边,重置
-                if card.pos().x() < -constants.CARD_DIMENSIONS.width():
-                    card.vector = None
-                    card.stack.add_card(card)
+            self.animation.start()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,256 @@
+import random
+
+import constants
+
+# 无界面的牌局模型, 不依赖Qt, 用于规则判断, 模拟和求解
+# 卡牌编码为 0-51 的整数: 花色序号 * 13 + (点数 - 1), 花色顺序同 constants.SUITS
+# C, S 为黑, H, D 为红, 所以 id >= 26 即红色
+
+N_CARDS = 52
+
+# 栈编号, 顺序同 MainWindow.stacks
+DECK = 0
+DEAL = 1
+WORKS = range(2, 9)
+DROPS = range(9, 13)
+N_STACKS = 13
+
+# 操作记录类型, 每次操作返回一个小元组, 交给 Game.undo 撤销
+MOVE = 0  # (MOVE, src, dst, n)
+FLIP = 1  # (FLIP, stack)
+DEAL_CARDS = 2  # (DEAL_CARDS, n, spread_from)
+RESTACK = 3  # (RESTACK, n)
+
+
+def card_id(value, suit):
+    return constants.SUITS.index(suit) * 13 + value - 1
+
+
+def card_value(card):
+    return card % 13 + 1
+
+
+def card_suit(card):
+    return constants.SUITS[card // 13]
+
+
+def is_red(card):
+    return card >= 26
+
+
+def card_name(card):
+    return '%s%s' % (card_value(card), card_suit(card))
+
+
+# 规则: 工作栈, 空栈可放任意牌, 否则颜色相反且点数小一
+def work_accepts(top, card):
+    if top is None:
+        return True
+    return (card >= 26) != (top >= 26) and card % 13 == top % 13 - 1
+
+
+# 规则: 归栈, 空栈只收A, 否则同花色且点数大一
+def drop_accepts(top, card):
+    if top is None:
+        return card % 13 == 0
+    return card == top + 1 and card % 13 != 0
+
+
+# 按种子洗牌, 返回发牌顺序(从末尾取牌), 种子相同则牌局相同
+def shuffled_deck(seed=None):
+    deck = list(range(N_CARDS))
+    random.Random(seed).shuffle(deck)
+    return deck
+
+
+class Game:
+    __slots__ = ('stacks', 'face_up', 'restack_counter', 'spread_from', 'deal_n', 'rounds_n')
+
+    def __init__(self, deal_n=3, rounds_n=3):
+        self.stacks = [bytearray() for _ in range(N_STACKS)]  # 栈底在前, 栈顶在后
+        self.face_up = bytearray(N_CARDS)  # 1 -> 正面
+
+        self.restack_counter = 0
+        self.spread_from = 0
+
+        self.deal_n = deal_n
+        self.rounds_n = rounds_n
+
+    # 从界面读取当前牌局
+    @classmethod
+    def from_window(cls, window):
+        game = cls(window.deal_n, window.rounds_n)
+        for n, stack in enumerate(window.stacks):
+            game.stacks[n] = bytearray(card.id for card in stack.cards)
+            for card in stack.cards:
+                game.face_up[card.id] = card.is_face_up
+        game.restack_counter = window.deckstack.restack_counter
+        game.spread_from = window.dealstack.spread_from
+        return game
+
+    def copy(self):
+        game = Game(self.deal_n, self.rounds_n)
+        game.stacks = [bytearray(s) for s in self.stacks]
+        game.face_up = bytearray(self.face_up)
+        game.restack_counter = self.restack_counter
+        game.spread_from = self.spread_from
+        return game
+
+    # 同 MainWindow.shuffle_and_stack, deck 为洗好的牌, 从末尾发牌
+    def shuffle_and_stack(self, deck):
+        stacks = self.stacks = [bytearray() for _ in range(N_STACKS)]
+        face_up = self.face_up = bytearray(N_CARDS)
+        self.restack_counter = 0
+        self.spread_from = 0
+
+        cards = list(deck)
+        for n, stack in enumerate(WORKS, 1):
+            for a in range(n):
+                stacks[stack].append(cards.pop())
+            face_up[stacks[stack][-1]] = 1
+
+        stacks[DECK].extend(cards)
+
+    def new_game(self, seed=None):
+        self.shuffle_and_stack(shuffled_deck(seed))
+
+    def top(self, stack):
+        cards = self.stacks[stack]
+        return cards[-1] if cards else None
+
+    # 同 DeckStack.can_restack
+    def can_restack(self):
+        return self.rounds_n is None or self.restack_counter < self.rounds_n - 1
+
+    # 同 StackBase.is_free_card 及子类
+    def is_free_card(self, stack, index):
+        if stack == DEAL:
+            return index == len(self.stacks[stack]) - 1
+        if stack >= WORKS.start and stack < WORKS.stop:
+            return self.face_up[self.stacks[stack][index]] == 1
+        return False
+
+    # 拖动 stacks[src][index:] 到 dst; 归栈只接受单张牌
+    def can_move(self, src, index, dst):
+        if src == dst or not self.is_free_card(src, index):
+            return False
+
+        card = self.stacks[src][index]
+        if dst >= DROPS.start:
+            return index == len(self.stacks[src]) - 1 and drop_accepts(self.top(dst), card)
+        if dst >= WORKS.start:
+            return work_accepts(self.top(dst), card)
+        return False
+
+    # 不检查规则, 调用前先 can_move
+    def move(self, src, index, dst):
+        cards = self.stacks[src]
+        moving = cards[index:]
+        del cards[index:]
+        self.stacks[dst] += moving
+        return MOVE, src, dst, len(moving)
+
+    def can_flip(self, stack):
+        cards = self.stacks[stack]
+        return stack != DECK and bool(cards) and not self.face_up[cards[-1]]
+
+    # 同 Card.mousePressEvent, 翻开栈顶的背面牌
+    def flip(self, stack):
+        self.face_up[self.stacks[stack][-1]] = 1
+        return FLIP, stack
+
+    # 同 MainWindow.deal, 发牌或重洗, 都不能时返回 None
+    def deal(self):
+        deck = self.stacks[DECK]
+        if deck:
+            return self.deal_cards(min(self.deal_n, len(deck)))
+
+        if self.can_restack():
+            return self.restack()
+
+        return None
+
+    # 同 MainWindow.deal_from_deck, 从牌堆发 n 张
+    def deal_cards(self, n):
+        deck, deal = self.stacks[DECK], self.stacks[DEAL]
+        spread_from = self.spread_from
+        self.spread_from = len(deal)
+        for _ in range(n):
+            card = deck.pop()
+            deal.append(card)
+            self.face_up[card] = 1
+        return DEAL_CARDS, n, spread_from
+
+    # 同 DeckStack.restack
+    def restack(self):
+        deck, deal = self.stacks[DECK], self.stacks[DEAL]
+        self.restack_counter += 1
+        n = len(deal)
+        for card in deal:
+            self.face_up[card] = 0
+        deck += deal[::-1]
+        del deal[:]
+        return RESTACK, n
+
+    # 同 MainWindow.auto_drop_card, 只处理栈顶的牌
+    def auto_drop(self, src):
+        cards = self.stacks[src]
+        if not cards or not self.is_free_card(src, len(cards) - 1):
+            return None
+
+        card = cards[-1]
+        for dst in DROPS:
+            if drop_accepts(self.top(dst), card):
+                return self.move(src, len(cards) - 1, dst)
+
+        return None
+
+    # 撤销一次操作, 代价只与移动的牌数有关
+    def undo(self, record):
+        kind = record[0]
+        if kind == MOVE:
+            _, src, dst, n = record
+            cards = self.stacks[dst]
+            self.stacks[src] += cards[-n:]
+            del cards[-n:]
+        elif kind == FLIP:
+            self.face_up[self.stacks[record[1]][-1]] = 0
+        elif kind == DEAL_CARDS:
+            _, n, spread_from = record
+            deck, deal = self.stacks[DECK], self.stacks[DEAL]
+            for _ in range(n):
+                card = deal.pop()
+                deck.append(card)
+                self.face_up[card] = 0
+            self.spread_from = spread_from
+        elif kind == RESTACK:
+            deck, deal = self.stacks[DECK], self.stacks[DEAL]
+            deal += deck[::-1]
+            del deck[:]
+            for card in deal:
+                self.face_up[card] = 1
+            self.restack_counter -= 1
+
+    # 按记录重做撤销过的操作, 不看当前的 deal_n/rounds_n, 同 MainWindow.redo
+    def redo(self, record):
+        kind = record[0]
+        if kind == MOVE:
+            _, src, dst, n = record
+            self.move(src, len(self.stacks[src]) - n, dst)
+        elif kind == FLIP:
+            self.flip(record[1])
+        elif kind == DEAL_CARDS:
+            self.deal_cards(record[1])
+        else:
+            self.restack()
+
+    def is_won(self):
+        return all(len(self.stacks[n]) == 13 for n in DROPS)
+
+    def __repr__(self):
+        def show(stack):
+            return ' '.join(
+                card_name(c) if self.face_up[c] else '[%s]' % card_name(c) for c in self.stacks[stack]
+            )
+
+        return '\n'.join('%2d: %s' % (n, show(n)) for n in range(N_STACKS))
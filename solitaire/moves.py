@@ -0,0 +1,148 @@
+import solver
+from model import DEAL, DECK, DROPS, N_CARDS, WORKS
+
+# 合法走法生成, 基于预先计算的查找表, 不逐个试探目标栈
+# 走法格式同 Game.can_move: (src, index, dst), 移动 stacks[src][index:]
+
+# 能放在哪些牌上: 颜色相反且点数大一, K 没有(只能放空栈)
+WORK_PARENTS = tuple(
+    () if card % 13 == 12 else tuple(
+        suit * 13 + card % 13 + 1 for suit in ((2, 3) if card < 26 else (0, 1))
+    )
+    for card in range(N_CARDS)
+)
+
+# 归栈顶需要是哪张牌, A 需要空栈
+DROP_AFTER = tuple(None if card % 13 == 0 else card - 1 for card in range(N_CARDS))
+
+
+# tops 为各归栈的栈顶编号(空栈为 None), 返回可放入的归栈序号
+def drop_index(tops, card):
+    after = DROP_AFTER[card]
+    for n, top in enumerate(tops):
+        if top == after:
+            return n
+    return None
+
+
+def drop_target(game, card):
+    n = drop_index([game.top(dst) for dst in DROPS], card)
+    return None if n is None else DROPS[n]
+
+
+# 可以拖动的牌的起始位置
+def free_range(game, src):
+    cards = game.stacks[src]
+    if not cards:
+        return range(0)
+    if src == DEAL:
+        return range(len(cards) - 1, len(cards))
+
+    face_up = game.face_up
+    start = len(cards)
+    while start > 0 and face_up[cards[start - 1]]:
+        start -= 1
+    return range(start, len(cards))
+
+
+def legal_moves(game):
+    stacks = game.stacks
+    tops = [game.top(dst) for dst in DROPS]
+
+    # 工作栈栈顶 -> 栈
+    work_tops = {}
+    empty_works = []
+    for dst in WORKS:
+        if stacks[dst]:
+            work_tops[stacks[dst][-1]] = dst
+        else:
+            empty_works.append(dst)
+
+    moves = []
+    for src in (DEAL,) + tuple(WORKS):
+        cards = stacks[src]
+        for index in free_range(game, src):
+            card = cards[index]
+
+            if index == len(cards) - 1:
+                after = DROP_AFTER[card]
+                for n, top in enumerate(tops):
+                    if top == after:
+                        moves.append((src, index, DROPS[n]))
+                        if after is not None:
+                            break
+
+            for parent in WORK_PARENTS[card]:
+                dst = work_tops.get(parent)
+                if dst is not None and dst != src:
+                    moves.append((src, index, dst))
+
+            for dst in empty_works:
+                moves.append((src, index, dst))
+
+    return moves
+
+
+# 所有牌都已翻开且发牌堆已空, 只需依次归栈
+def can_autocomplete(game):
+    if game.stacks[DECK] or game.stacks[DEAL]:
+        return False
+    face_up = game.face_up
+    return all(face_up[card] for src in WORKS for card in game.stacks[src])
+
+
+# 在 game 上依次执行最多 limit 步归栈, 返回走过的步骤
+def autocomplete(game, limit=None):
+    done = []
+    progress = True
+    while progress and (limit is None or len(done) < limit):
+        progress = False
+        for src in WORKS:
+            cards = game.stacks[src]
+            if cards:
+                dst = drop_target(game, cards[-1])
+                if dst is not None:
+                    move = (src, len(cards) - 1, dst)
+                    game.move(*move)
+                    done.append(move)
+                    progress = True
+                    if limit is not None and len(done) >= limit:
+                        break
+    return done
+
+
+# 提示: ('flip', stack) | ('move', src, index, dst) | ('deal',) | None
+def hint(game, max_nodes=3000):
+    for src in WORKS:
+        if game.can_flip(src):
+            return 'flip', src
+
+    # 先让求解器找一条能赢的路线
+    search = solver.Solver(game.copy(), max_nodes=max_nodes)
+    if search.solve() == solver.SOLVED and search.solution:
+        record = search.solution[0]
+        if record[0] == solver.MOVE:
+            _, src, dst, n = record
+            return 'move', src, len(game.stacks[src]) - n, dst
+        return 'deal',
+
+    # 求解不出时按启发式: 归栈 > 翻牌 > 发牌栈 > 其它
+    best = None
+    for move in legal_moves(game):
+        src, index, dst = move
+        if dst in DROPS:
+            rank = 0
+        elif src in WORKS and index > 0 and not game.face_up[game.stacks[src][index - 1]]:
+            rank = 1
+        elif src == DEAL and game.stacks[dst]:
+            rank = 2
+        else:
+            continue  # 拆开已翻开的牌或搬到空栈, 不作为提示
+        if best is None or rank < best[0]:
+            best = rank, move
+
+    if best:
+        return ('move',) + best[1]
+    if game.stacks[DECK] or (game.stacks[DEAL] and game.can_restack()):
+        return 'deal',
+    return None
@@ -0,0 +1,70 @@
+from collections import namedtuple
+
+from items import Card
+from PySide6.QtGui import QPainter
+from PySide6.QtWidgets import QGraphicsItem, QGraphicsScene, QGraphicsView
+
+# 渲染配置, View 菜单中切换
+# 拖动工作栈中13张的一列, 每帧绘制耗时中位数(ms, offscreen 软件光栅, bench.py drag_paint_*):
+#   default      0.70
+#   performance  0.28
+# 主要收益来自 BoundingRectViewportUpdate: 拖动时只有一个矩形脏区域, 合并后比逐块更新便宜
+# 卡牌本身就是未缩放的 pixmap, DeviceCoordinateCache 只多一次拷贝, 测得没有收益, 所以不开
+
+Profile = namedtuple('Profile', [
+    'viewport_update',
+    'card_cache',
+    'bsp_depth',  # 0 = Qt 自动
+    'cache_background',  # 缓存平铺的台布
+    'antialiasing',
+    'optimization_flags',
+])
+
+DEFAULT = 'default'
+PERFORMANCE = 'performance'
+
+PROFILES = {
+    DEFAULT: Profile(
+        viewport_update=QGraphicsView.ViewportUpdateMode.MinimalViewportUpdate,
+        card_cache=QGraphicsItem.CacheMode.NoCache,
+        bsp_depth=0,
+        cache_background=False,
+        antialiasing=False,
+        optimization_flags=QGraphicsView.OptimizationFlag(0),
+    ),
+    PERFORMANCE: Profile(
+        viewport_update=QGraphicsView.ViewportUpdateMode.BoundingRectViewportUpdate,
+        card_cache=QGraphicsItem.CacheMode.NoCache,
+        bsp_depth=3,  # 场景只有约70个图形项, 大多不动
+        cache_background=True,
+        antialiasing=False,
+        optimization_flags=(
+            QGraphicsView.OptimizationFlag.DontSavePainterState
+            | QGraphicsView.OptimizationFlag.DontAdjustForAntialiasing
+        ),
+    ),
+}
+
+
+def apply_profile(view, name):
+    profile = PROFILES[name]
+    scene = view.scene()
+
+    view.setViewportUpdateMode(profile.viewport_update)
+    view.setCacheMode(
+        QGraphicsView.CacheModeFlag.CacheBackground if profile.cache_background
+        else QGraphicsView.CacheModeFlag.CacheNone
+    )
+    view.resetCachedContent()
+    view.setRenderHint(QPainter.RenderHint.Antialiasing, profile.antialiasing)
+    view.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform, profile.antialiasing)
+    view.setOptimizationFlags(profile.optimization_flags)
+
+    scene.setItemIndexMethod(QGraphicsScene.ItemIndexMethod.BspTreeIndex)
+    scene.setBspTreeDepth(profile.bsp_depth)
+
+    for item in scene.items():
+        if isinstance(item, Card):
+            item.setCacheMode(profile.card_cache)
+
+    view.viewport().update()
@@ -0,0 +1,223 @@
+import argparse
+import os
+import struct
+import sys
+import time
+
+import savegame
+from model import DEAL_CARDS, FLIP, MOVE, RESTACK
+
+# 对局录像: 起始牌局 + 每步2字节的操作流, 可以在界面上慢放, 也可以无界面按规则快速重放
+# 文件由多条记录依次追加而成:
+#   头部   magic, 版本, 步数
+#   起始   savegame 记录(76字节), 含牌局号和设置
+#   操作   每步2字节: 类型 << 4 | 栈, 目标栈 << 4 | 牌数
+#          设置为 SETTINGS << 4 | deal_n, rounds_n(0=无限)
+# 版本 2 加入 SETTINGS, 版本 1 的文件仍然可以读取
+
+MAGIC = b'RP'
+VERSION = 2
+
+HEADER = struct.Struct('<2sBI')
+
+# 操作类型, MOVE 和 FLIP 同 model; 发牌和重洗都记为 DEAL, 由规则决定是哪一种
+DEAL = 2
+UNDO = 4
+REDO = 5
+SETTINGS = 6  # (SETTINGS, deal_n, rounds_n), 之后的发牌按新设置
+
+REPLAYS_PATH = 'replays.rpl'
+
+
+# model 的操作记录 -> 录像操作
+def operation(command):
+    kind = command[0]
+    if kind in (MOVE, FLIP):
+        return command
+    if kind in (DEAL_CARDS, RESTACK):
+        return DEAL,
+    raise ValueError('unknown command %r' % (command,))
+
+
+def encode_op(op):
+    kind = op[0]
+    if kind == MOVE:
+        _, src, dst, n = op
+        return bytes((MOVE << 4 | src, dst << 4 | n))
+    if kind == FLIP:
+        return bytes((FLIP << 4 | op[1], 0))
+    if kind == SETTINGS:
+        _, deal_n, rounds_n = op
+        return bytes((SETTINGS << 4 | deal_n, rounds_n or 0))
+    return bytes((kind << 4, 0))
+
+
+def decode_ops(data):
+    ops = []
+    for n in range(0, len(data), 2):
+        first, second = data[n], data[n + 1]
+        kind = first >> 4
+        if kind == MOVE:
+            ops.append((MOVE, first & 15, second >> 4, second & 15))
+        elif kind == FLIP:
+            ops.append((FLIP, first & 15))
+        elif kind in (DEAL, UNDO, REDO):
+            ops.append((kind,))
+        elif kind == SETTINGS:
+            ops.append((SETTINGS, first & 15, second or None))
+        else:
+            raise ValueError('unknown replay operation %d' % kind)
+    return ops
+
+
+# 一局的录像
+class Recorder:
+    def __init__(self, game, seed=0):
+        self.start = savegame.encode(game, seed)
+        self.ops = bytearray()
+
+    def add(self, command):
+        self.ops += encode_op(operation(command))
+
+    def undo(self):
+        self.ops += encode_op((UNDO,))
+
+    def redo(self):
+        self.ops += encode_op((REDO,))
+
+    def settings(self, deal_n, rounds_n):
+        self.ops += encode_op((SETTINGS, deal_n, rounds_n))
+
+    def __len__(self):
+        return len(self.ops) // 2
+
+    def encode(self):
+        return HEADER.pack(MAGIC, VERSION, len(self)) + self.start + bytes(self.ops)
+
+    # -> (Game, seed, ops), 同 read_one
+    def decode(self):
+        game, seed = savegame.decode(self.start)
+        return game, seed, decode_ops(bytes(self.ops))
+
+
+def append(path, recorder):
+    with open(path, 'ab') as f:
+        f.write(recorder.encode())
+
+
+# 从当前位置读一条 -> (Game, seed, ops), 文件结束返回 None
+def read_one(f):
+    header = f.read(HEADER.size)
+    if not header:
+        return None
+    if len(header) < HEADER.size:
+        raise ValueError('truncated replay header')
+    magic, version, n = HEADER.unpack(header)
+    if magic != MAGIC:
+        raise ValueError('not a replay')
+    if not 1 <= version <= VERSION:
+        raise ValueError('unsupported replay version %d' % version)
+
+    data = f.read(savegame.RECORD_SIZE + 2 * n)
+    if len(data) < savegame.RECORD_SIZE + 2 * n:
+        raise ValueError('truncated replay')
+    game, seed = savegame.decode(data[:savegame.RECORD_SIZE])
+    return game, seed, decode_ops(data[savegame.RECORD_SIZE:])
+
+
+# 逐条读取, 不一次读入整个文件
+def read_all(path):
+    with open(path, 'rb') as f:
+        while True:
+            replay = read_one(f)
+            if replay is None:
+                return
+            yield replay
+
+
+# 最后一条记录, 只读头部跳过前面的操作
+def read_last(path):
+    last = None
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        while f.tell() < size:
+            last = f.tell()
+            header = f.read(HEADER.size)
+            if len(header) < HEADER.size:
+                raise ValueError('truncated replay header')
+            f.seek(savegame.RECORD_SIZE + 2 * HEADER.unpack(header)[2], os.SEEK_CUR)
+        if last is None:
+            raise IndexError('no replays')
+        f.seek(last)
+        return read_one(f)
+
+
+# 按规则在 game 上重放, 非法操作抛出 ValueError
+# 重做按撤销时的记录原样执行, 和 MainWindow.redo 一样不受之后改过的设置影响
+def play(game, ops):
+    undo, redo = [], []
+    for n, op in enumerate(ops):
+        kind = op[0]
+        if kind == UNDO or kind == REDO:
+            source, target = (undo, redo) if kind == UNDO else (redo, undo)
+            if not source:
+                raise ValueError('step %d: nothing to %s' % (n, 'undo' if kind == UNDO else 'redo'))
+            record = source.pop()
+            if kind == UNDO:
+                game.undo(record)
+            else:
+                game.redo(record)
+            target.append(record)
+            continue
+        if kind == SETTINGS:
+            _, game.deal_n, game.rounds_n = op
+            continue
+
+        undo.append(apply(game, op, n))
+        redo.clear()
+    return game
+
+
+def apply(game, op, n):
+    kind = op[0]
+    if kind == MOVE:
+        _, src, dst, count = op
+        index = len(game.stacks[src]) - count
+        if index < 0 or not game.can_move(src, index, dst):
+            raise ValueError('step %d: illegal move %r' % (n, op))
+        return game.move(src, index, dst)
+    if kind == FLIP:
+        if not game.can_flip(op[1]):
+            raise ValueError('step %d: illegal flip %r' % (n, op))
+        return game.flip(op[1])
+    record = game.deal()
+    if record is None:
+        raise ValueError('step %d: cannot deal' % n)
+    return record
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replay recorded games against the rules.')
+    parser.add_argument('path', nargs='?', default=REPLAYS_PATH)
+    args = parser.parse_args(argv)
+
+    games = moves = won = 0
+    failed = []
+    start = time.perf_counter()
+    for game, seed, ops in read_all(args.path):
+        games += 1
+        moves += len(ops)
+        try:
+            won += play(game, ops).is_won()
+        except ValueError as e:
+            failed.append((games - 1, seed, str(e)))
+    elapsed = time.perf_counter() - start
+
+    print('{} games, {} moves, {} won, {:.0f} moves/s'.format(games, moves, won, moves / max(elapsed, 1e-9)))
+    for n, seed, error in failed:
+        print('replay {} (#{}): {}'.format(n, seed, error), file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
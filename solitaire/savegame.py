@@ -0,0 +1,111 @@
+import os
+import struct
+
+from model import N_CARDS, N_STACKS, Game
+
+# 存档: 每局一条固定长度的二进制记录
+#   头部   magic, 版本, deal_n, rounds_n(0=无限), restack_counter(最多255), spread_from, 牌局号
+#   栈长   13个栈各1字节, 顺序同 model 中的栈编号
+#   卡牌   52字节, 按栈依次排列, 最高位为正面
+# 多条记录可以依次追加到同一个文件
+
+MAGIC = b'SG'
+VERSION = 1
+
+HEADER = struct.Struct('<2sBBBBBI')
+RECORD_SIZE = HEADER.size + N_STACKS + N_CARDS  # 76
+
+FACE_UP = 0x80
+
+RESUME_PATH = 'resume.sav'  # 关闭时的牌局
+SAVES_PATH = 'saves.sav'  # 手动存档, 只追加
+
+# 回合有限时 restack_counter < rounds_n - 1 < 255; 只有无限回合会超过, 此时不影响规则, 截到 255
+MAX_RESTACKS = 255
+
+
+def encode(game, seed=0):
+    header = HEADER.pack(
+        MAGIC, VERSION, game.deal_n, game.rounds_n or 0,
+        min(game.restack_counter, MAX_RESTACKS), game.spread_from, seed or 0,
+    )
+    lengths = bytes(len(cards) for cards in game.stacks)
+    cards = bytes(card | (FACE_UP if game.face_up[card] else 0) for stack in game.stacks for card in stack)
+    return header + lengths + cards
+
+
+# -> (Game, seed)
+def decode(data):
+    if len(data) != RECORD_SIZE:
+        raise ValueError('save record must be %d bytes, got %d' % (RECORD_SIZE, len(data)))
+
+    magic, version, deal_n, rounds_n, restack_counter, spread_from, seed = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError('not a saved game')
+    if version != VERSION:
+        raise ValueError('unsupported save version %d' % version)
+
+    lengths = data[HEADER.size:HEADER.size + N_STACKS]
+    cards = data[HEADER.size + N_STACKS:]
+    if sum(lengths) != N_CARDS or sorted(card & ~FACE_UP for card in cards) != list(range(N_CARDS)):
+        raise ValueError('corrupt saved game')
+
+    game = Game(deal_n, rounds_n or None)
+    game.restack_counter = restack_counter
+    game.spread_from = spread_from
+
+    at = 0
+    for n, length in enumerate(lengths):
+        stack = cards[at:at + length]
+        game.stacks[n] = bytearray(card & ~FACE_UP for card in stack)
+        for card in stack:
+            game.face_up[card & ~FACE_UP] = 1 if card & FACE_UP else 0
+        at += length
+
+    return game, seed
+
+
+# 先编码, 写到临时文件再替换, 出错时原来的存档不受影响
+def write(path, game, seed=0):
+    data = encode(game, seed)
+    temp = path + '.tmp'
+    with open(temp, 'wb') as f:
+        f.write(data)
+    os.replace(temp, path)
+
+
+def read(path):
+    with open(path, 'rb') as f:
+        return decode(f.read())
+
+
+def append(path, game, seed=0):
+    data = encode(game, seed)
+    with open(path, 'ab') as f:
+        f.write(data)
+
+
+def count(path):
+    return os.path.getsize(path) // RECORD_SIZE if os.path.exists(path) else 0
+
+
+# 第 n 条记录, 负数从末尾数
+def read_record(path, n=-1):
+    total = count(path)
+    if n < 0:
+        n += total
+    if not 0 <= n < total:
+        raise IndexError('no saved game %d' % n)
+
+    with open(path, 'rb') as f:
+        f.seek(n * RECORD_SIZE)
+        return decode(f.read(RECORD_SIZE))
+
+
+def read_all(path):
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(RECORD_SIZE)
+            if len(data) < RECORD_SIZE:
+                return
+            yield decode(data)
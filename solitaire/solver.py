@@ -0,0 +1,305 @@
+import argparse
+import json
+import multiprocessing
+import random
+import sys
+import time
+from collections import namedtuple
+
+from model import DEAL, DECK, DROPS, FLIP, MOVE, N_STACKS, WORKS, Game, drop_accepts, work_accepts
+
+# Klondike 求解器: 深度优先搜索 + Zobrist 置换表 + 走法剪枝
+# python solver.py --start 0 --count 10000 --deal-n 3 --rounds-n 3
+
+SOLVED = 'solved'
+# UNSOLVABLE 不是证明无解: 走法剪枝是启发式的, 只表示剪枝后的搜索走完了也没找到
+UNSOLVABLE = 'unsolvable'  # 节点上限内搜完剪枝后的空间, 没有找到解
+UNKNOWN = 'unknown'  # 超出节点上限
+
+# status 为上面三种之一
+Result = namedtuple('Result', 'seed status nodes seconds moves')
+
+# Zobrist 表: 每个 (栈, 位置, 牌, 正反面) 一个64位随机数, 固定种子保证各进程一致
+_rng = random.Random(0x5015)
+ZOBRIST = [_rng.getrandbits(64) for _ in range(N_STACKS * 52 * 104)]
+ZOBRIST_ROUNDS = [_rng.getrandbits(64) for _ in range(256)]
+MAX_ROUNDS = 255  # restack_counter < rounds_n - 1, 在 ZOBRIST_ROUNDS 内; 牌局索引的头部按1字节存
+
+# 同色的另两种花色, 用于判断安全归栈
+OTHER_COLOR_SUITS = {0: (2, 3), 1: (2, 3), 2: (0, 1), 3: (0, 1)}
+
+
+class Solver:
+    def __init__(self, game, max_nodes=200000, table_size=1000000):
+        self.game = game
+        self.max_nodes = max_nodes
+        self.table_size = table_size  # 置换表上限, 控制内存, 满了淘汰较早的一半
+
+        self.nodes = 0
+        self.solution = None  # 操作记录列表, 可依次交给 model.Game 重放
+
+        self._hashes = [self.stack_hash(n) for n in range(N_STACKS)]
+
+    def stack_hash(self, stack):
+        face_up = self.game.face_up
+        base = stack * 52
+        h = 0
+        for pos, card in enumerate(self.game.stacks[stack]):
+            h ^= ZOBRIST[(base + pos) * 104 + card * 2 + face_up[card]]
+        return h
+
+    def hash(self):
+        h = 0
+        for stack_hash in self._hashes:
+            h ^= stack_hash
+        # 回合无限时回合数不影响局面
+        if self.game.rounds_n is not None:
+            h ^= ZOBRIST_ROUNDS[self.game.restack_counter]
+        return h
+
+    # 当前局面的候选走法, 越靠前越优先; None 表示发牌
+    def moves(self):
+        game = self.game
+        stacks, face_up = game.stacks, game.face_up
+
+        # 各花色已归栈的点数, 以及每张牌能去的归栈
+        found = [0, 0, 0, 0]
+        empty_drop = None
+        drop_for = {}
+        for dst in DROPS:
+            top = game.top(dst)
+            if top is None:
+                if empty_drop is None:
+                    empty_drop = dst
+            else:
+                found[top // 13] = top % 13 + 1
+                drop_for[top + 1] = dst
+
+        def drop_target(card):
+            if card % 13 == 0:
+                return empty_drop
+            dst = drop_for.get(card)
+            return dst if dst is not None and drop_accepts(game.top(dst), card) else None
+
+        # 1. 归栈; 安全的归栈直接执行, 不再分支
+        to_drop = []
+        for src in (DEAL,) + tuple(WORKS):
+            cards = stacks[src]
+            if cards and face_up[cards[-1]]:
+                card = cards[-1]
+                dst = drop_target(card)
+                if dst is not None:
+                    value = card % 13 + 1
+                    a, b = OTHER_COLOR_SUITS[card // 13]
+                    if value <= 2 or (found[a] >= value - 1 and found[b] >= value - 1):
+                        return [(src, len(cards) - 1, dst)]
+                    to_drop.append((src, len(cards) - 1, dst))
+
+        empty_work = None
+        for dst in WORKS:
+            if not stacks[dst]:
+                empty_work = dst
+                break
+
+        # 2. 工作栈之间移动, 优先能翻开背面牌的
+        reveal, other = [], []
+        for src in WORKS:
+            cards = stacks[src]
+            for i in range(len(cards)):
+                if not face_up[cards[i]]:
+                    continue
+                card = cards[i]
+                below_hidden = i > 0 and not face_up[cards[i - 1]]
+                # 下面的牌已经翻开: 只有能让它归栈时才拆开
+                if i > 0 and not below_hidden and drop_target(cards[i - 1]) is None:
+                    continue
+                for dst in WORKS:
+                    if dst == src:
+                        continue
+                    top = game.top(dst)
+                    if top is None:
+                        # 整列搬到空列没有意义, 多个空列只试第一个
+                        if i == 0 or dst != empty_work:
+                            continue
+                    elif not work_accepts(top, card):
+                        continue
+                    (reveal if below_hidden else other).append((src, i, dst))
+
+        # 3. 发牌栈顶 -> 工作栈
+        from_deal = []
+        cards = stacks[DEAL]
+        if cards:
+            card = cards[-1]
+            for dst in WORKS:
+                top = game.top(dst)
+                if top is None and dst != empty_work:
+                    continue
+                if work_accepts(top, card):
+                    from_deal.append((DEAL, len(cards) - 1, dst))
+
+        moves = to_drop + reveal + from_deal + other
+
+        # 4. 发牌 / 重洗
+        if stacks[DECK] or (stacks[DEAL] and game.can_restack()):
+            moves.append(None)
+
+        return moves
+
+    # 执行走法并自动翻开背面牌, 返回 (操作记录, 受影响的栈)
+    def apply(self, move):
+        game = self.game
+        if move is None:
+            records = [game.deal()]
+            touched = (DECK, DEAL)
+        else:
+            src, index, dst = move
+            records = [game.move(src, index, dst)]
+            if game.can_flip(src):
+                records.append(game.flip(src))
+            touched = (src, dst)
+
+        for stack in touched:
+            self._hashes[stack] = self.stack_hash(stack)
+        return records, touched
+
+    def undo(self, records, touched):
+        for record in reversed(records):
+            self.game.undo(record)
+        for stack in touched:
+            self._hashes[stack] = self.stack_hash(stack)
+
+    def solve(self):
+        game = self.game
+        if game.is_won():
+            self.solution = []
+            return SOLVED
+
+        # 置换表分新旧两代, 各 table_size // 2; 新一代满了旧一代被丢弃, 始终保留最近的局面
+        seen = {self.hash()}
+        old = set()
+        half = max(1, self.table_size // 2)
+        path = []  # 每层的 (records, touched)
+        pending = [iter(self.moves())]
+
+        while pending:
+            move = next(pending[-1], False)
+            if move is False:
+                pending.pop()
+                if path:
+                    self.undo(*path.pop())
+                continue
+
+            records, touched = self.apply(move)
+            h = self.hash()
+            if h in seen or h in old:
+                self.undo(records, touched)
+                continue
+
+            self.nodes += 1
+            if len(seen) >= half:
+                old, seen = seen, set()
+            seen.add(h)
+
+            if game.is_won():
+                path.append((records, touched))
+                self.solution = [r for records, _ in path for r in records]
+                for step in reversed(path):
+                    self.undo(*step)
+                return SOLVED
+
+            if self.nodes >= self.max_nodes:
+                self.undo(records, touched)
+                for step in reversed(path):
+                    self.undo(*step)
+                return UNKNOWN
+
+            path.append((records, touched))
+            pending.append(iter(self.moves()))
+
+        return UNSOLVABLE
+
+
+# 在模型上重放求解结果
+def replay(game, solution):
+    for record in solution:
+        kind = record[0]
+        if kind == MOVE:
+            _, src, dst, n = record
+            game.move(src, len(game.stacks[src]) - n, dst)
+        elif kind == FLIP:
+            game.flip(record[1])
+        else:
+            game.deal()
+    return game
+
+
+def solve_seed(seed, deal_n=3, rounds_n=3, max_nodes=200000, table_size=1000000):
+    game = Game(deal_n, rounds_n)
+    game.new_game(seed)
+
+    start = time.perf_counter()
+    solver = Solver(game, max_nodes=max_nodes, table_size=table_size)
+    status = solver.solve()
+    seconds = time.perf_counter() - start
+
+    moves = len(solver.solution) if solver.solution is not None else None
+    return Result(seed, status, solver.nodes, seconds, moves)
+
+
+def _solve_args(args):
+    return solve_seed(*args)
+
+
+def rounds_arg(value):
+    if value in ('0', 'none', 'None', 'unlimited'):
+        return None
+    rounds = int(value)
+    if not 1 <= rounds <= MAX_ROUNDS:
+        raise argparse.ArgumentTypeError('rounds must be 1-%d or unlimited' % MAX_ROUNDS)
+    return rounds
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Classify solitaire deals as solvable or not.')
+    parser.add_argument('--start', type=int, default=0, help='first seed')
+    parser.add_argument('--count', type=int, default=100, help='number of seeds')
+    parser.add_argument('--deal-n', type=int, default=3, choices=(1, 3))
+    parser.add_argument('--rounds-n', type=rounds_arg, default=3, help='3, 5 or unlimited')
+    parser.add_argument('--max-nodes', type=int, default=200000, help='node limit per deal')
+    parser.add_argument(
+        '--table-size', type=int, default=1000000,
+        help='transposition table limit per worker, the older half is evicted when full',
+    )
+    parser.add_argument('--processes', type=int, default=None, help='worker processes (default: all cores)')
+    parser.add_argument('--json', action='store_true', help='print one JSON object per deal')
+    args = parser.parse_args(argv)
+
+    jobs = [
+        (seed, args.deal_n, args.rounds_n, args.max_nodes, args.table_size)
+        for seed in range(args.start, args.start + args.count)
+    ]
+    totals = {SOLVED: 0, UNSOLVABLE: 0, UNKNOWN: 0}
+
+    processes = args.processes or multiprocessing.cpu_count()
+    chunksize = max(1, len(jobs) // (processes * 16))
+
+    start = time.perf_counter()
+    with multiprocessing.Pool(processes, maxtasksperchild=1000) as pool:
+        for result in pool.imap_unordered(_solve_args, jobs, chunksize):
+            totals[result.status] += 1
+            if args.json:
+                print(json.dumps(result._asdict()))
+            else:
+                print('{:>8} {:<10} {:>9} nodes {:>8.3f}s {:>5} moves'.format(
+                    result.seed, result.status, result.nodes, result.seconds,
+                    '-' if result.moves is None else result.moves,
+                ))
+
+    elapsed = time.perf_counter() - start
+    print('{} deals in {:.1f}s: {} solved, {} unsolvable (not found by the pruned search), {} unknown'.format(
+        len(jobs), elapsed, totals[SOLVED], totals[UNSOLVABLE], totals[UNKNOWN],
+    ), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+# 战绩: 每局一行, 存在本地 SQLite
+# 写入放进队列, 由后台线程批量提交, GUI线程不等磁盘
+# summary 表随写入增量更新, 打开战绩窗口只读几行, 与局数无关
+
+STATS_PATH = 'stats.db'
+
+log = logging.getLogger(__name__)
+
+ALL = 0  # summary 中 deal_n = 0 的一行是全部设置合计
+
+BATCH = 256  # 一次事务最多写入的局数
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    seed INTEGER,
+    deal_n INTEGER NOT NULL,
+    rounds_n INTEGER NOT NULL,  -- 0 = 无限
+    moves INTEGER NOT NULL,
+    duration REAL NOT NULL,  -- 秒
+    result INTEGER NOT NULL,  -- 1 = 胜
+    restacks INTEGER NOT NULL,
+    finished REAL NOT NULL  -- time.time()
+);
+CREATE INDEX IF NOT EXISTS games_settings ON games (deal_n, rounds_n, result);
+CREATE INDEX IF NOT EXISTS games_settings_id ON games (deal_n, rounds_n, id);
+CREATE TABLE IF NOT EXISTS summary (
+    deal_n INTEGER NOT NULL,
+    rounds_n INTEGER NOT NULL,
+    played INTEGER NOT NULL,
+    won INTEGER NOT NULL,
+    streak INTEGER NOT NULL,  -- 当前连胜
+    best_streak INTEGER NOT NULL,
+    PRIMARY KEY (deal_n, rounds_n)
+);
+'''
+
+GameRecord = namedtuple('GameRecord', 'seed deal_n rounds_n moves duration result restacks finished')
+
+Summary = namedtuple('Summary', 'deal_n rounds_n played won streak best_streak')
+
+
+def connect(path):
+    db = sqlite3.connect(path)
+    db.execute('PRAGMA journal_mode=WAL')  # 读不等写
+    db.execute('PRAGMA synchronous=NORMAL')
+    db.executescript(SCHEMA)
+    return db
+
+
+def game_record(seed, deal_n, rounds_n, moves, duration, won, restacks):
+    return GameRecord(seed, deal_n, rounds_n or 0, moves, duration, 1 if won else 0, restacks, time.time())
+
+
+class StatsStore:
+    def __init__(self, path=STATS_PATH):
+        self.path = path
+        self.db = connect(path)  # GUI线程只读
+
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._write_loop, name='stats-writer', daemon=True)
+        self._thread.start()
+
+    # 不阻塞, 由后台线程写入
+    def add(self, record):
+        self._queue.put(record)
+
+    # 等待已加入的记录写完
+    def flush(self):
+        self._queue.join()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        self.db.close()
+
+    # 写入出错只记日志, 丢掉这一批, 队列中的每一项都标记完成, flush/close 不会一直等待
+    def _write_loop(self):
+        try:
+            db = connect(self.path)
+        except Exception:
+            log.exception('could not open %s, game records will not be saved', self.path)
+            db = None
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < BATCH:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            records = [record for record in batch if record is not None]
+            try:
+                if records and db is not None:
+                    with db:
+                        write(db, records)
+            except Exception:
+                log.exception('could not write %d game records to %s', len(records), self.path)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+            if len(records) < len(batch):
+                if db is not None:
+                    db.close()
+                return
+
+    # 各设置的汇总, ALL 行在最前
+    def summaries(self):
+        rows = self.db.execute(
+            'SELECT deal_n, rounds_n, played, won, streak, best_streak FROM summary ORDER BY deal_n, rounds_n'
+        ).fetchall()
+        return [Summary(*row) for row in rows]
+
+    def win_rate(self, deal_n, rounds_n):
+        return win_rate(self.db, deal_n, rounds_n)
+
+    def streaks(self, deal_n, rounds_n):
+        return streaks(self.db, deal_n, rounds_n)
+
+    def rebuild_summary(self):
+        self.flush()
+        with self.db:
+            rebuild_summary(self.db)
+
+
+def write(db, records):
+    db.executemany(
+        'INSERT INTO games (seed, deal_n, rounds_n, moves, duration, result, restacks, finished)'
+        ' VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+        records,
+    )
+    for record in records:
+        for key in ((record.deal_n, record.rounds_n), (ALL, ALL)):
+            db.execute(
+                'INSERT OR IGNORE INTO summary VALUES (?, ?, 0, 0, 0, 0)', key,
+            )
+            if record.result:
+                db.execute(
+                    'UPDATE summary SET played = played + 1, won = won + 1, streak = streak + 1,'
+                    ' best_streak = MAX(best_streak, streak + 1) WHERE deal_n = ? AND rounds_n = ?',
+                    key,
+                )
+            else:
+                db.execute(
+                    'UPDATE summary SET played = played + 1, streak = 0 WHERE deal_n = ? AND rounds_n = ?',
+                    key,
+                )
+
+
+# 以下查询都走 games_settings / games_settings_id 索引
+
+# -> (局数, 胜局数)
+def win_rate(db, deal_n, rounds_n):
+    played, won = db.execute(
+        'SELECT COUNT(*), COALESCE(SUM(result), 0) FROM games WHERE deal_n = ? AND rounds_n = ?',
+        (deal_n, rounds_n or 0),
+    ).fetchone()
+    return played, won
+
+
+# -> (当前连胜, 最长连胜)
+def streaks(db, deal_n, rounds_n):
+    key = (deal_n, rounds_n or 0)
+    last_loss = db.execute(
+        'SELECT MAX(id) FROM games WHERE deal_n = ? AND rounds_n = ? AND result = 0', key,
+    ).fetchone()[0]
+    current = db.execute(
+        'SELECT COUNT(*) FROM games WHERE deal_n = ? AND rounds_n = ? AND id > ?', key + (last_loss or 0,),
+    ).fetchone()[0]
+
+    # 连胜按之前的负局数分组
+    best = db.execute(
+        'SELECT COALESCE(MAX(n), 0) FROM ('
+        '  SELECT COUNT(*) AS n FROM ('
+        '    SELECT result, SUM(1 - result) OVER (ORDER BY id) AS losses'
+        '    FROM games WHERE deal_n = ? AND rounds_n = ?'
+        '  ) WHERE result = 1 GROUP BY losses'
+        ')',
+        key,
+    ).fetchone()[0]
+    return current, best
+
+
+# 从 games 重新计算 summary
+def rebuild_summary(db):
+    db.execute('DELETE FROM summary')
+    settings = db.execute('SELECT DISTINCT deal_n, rounds_n FROM games').fetchall()
+    for deal_n, rounds_n in settings:
+        played, won = win_rate(db, deal_n, rounds_n)
+        streak, best_streak = streaks(db, deal_n, rounds_n)
+        db.execute('INSERT INTO summary VALUES (?, ?, ?, ?, ?, ?)', (deal_n, rounds_n, played, won, streak, best_streak))
+
+    # 全部设置合计, 连胜按时间顺序跨设置计算
+    played, won = db.execute('SELECT COUNT(*), COALESCE(SUM(result), 0) FROM games').fetchone()
+    if played:
+        last_loss = db.execute('SELECT MAX(id) FROM games WHERE result = 0').fetchone()[0]
+        streak = db.execute('SELECT COUNT(*) FROM games WHERE id > ?', (last_loss or 0,)).fetchone()[0]
+        best_streak = db.execute(
+            'SELECT COALESCE(MAX(n), 0) FROM ('
+            '  SELECT COUNT(*) AS n FROM ('
+            '    SELECT result, SUM(1 - result) OVER (ORDER BY id) AS losses FROM games'
+            '  ) WHERE result = 1 GROUP BY losses'
+            ')'
+        ).fetchone()[0]
+        db.execute('INSERT INTO summary VALUES (?, ?, ?, ?, ?, ?)', (ALL, ALL, played, won, streak, best_streak))
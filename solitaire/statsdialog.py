@@ -0,0 +1,47 @@
+from stats import ALL
+from PySide6.QtWidgets import QDialog, QDialogButtonBox, QTableWidget, QTableWidgetItem, QVBoxLayout
+
+COLUMNS = ['Settings', 'Played', 'Won', 'Win rate', 'Streak', 'Best streak']
+
+
+def settings_name(deal_n, rounds_n):
+    if deal_n == ALL:
+        return 'All games'
+    return '%d card, %s rounds' % (deal_n, rounds_n or 'unlimited')
+
+
+# 战绩窗口, 只读 summary 表
+class StatsDialog(QDialog):
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle('Statistics')
+
+        summaries = store.summaries()
+
+        table = QTableWidget(len(summaries), len(COLUMNS))
+        table.setHorizontalHeaderLabels(COLUMNS)
+        table.verticalHeader().hide()
+        table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+
+        for row, summary in enumerate(summaries):
+            rate = summary.won / summary.played if summary.played else 0
+            values = [
+                settings_name(summary.deal_n, summary.rounds_n),
+                summary.played,
+                summary.won,
+                '{:.1%}'.format(rate),
+                summary.streak,
+                summary.best_streak,
+            ]
+            for column, value in enumerate(values):
+                table.setItem(row, column, QTableWidgetItem(str(value)))
+        table.resizeColumnsToContents()
+
+        buttons = QDialogButtonBox(QDialogButtonBox.StandardButton.Close)
+        buttons.rejected.connect(self.reject)
+
+        layout = QVBoxLayout()
+        layout.addWidget(table)
+        layout.addWidget(buttons)
+        self.setLayout(layout)
+        self.resize(520, 240)
@@ -0,0 +1,394 @@
+import argparse
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import estimate
+import model
+import moves
+import savegame
+from items import COMPLETE, DealStack, DeckStack, DropStack, WorkStack
+from PySide6.QtCore import QEvent, QPointF
+from PySide6.QtWidgets import QApplication, QGraphicsSceneMouseEvent
+
+# 随机压力测试: 无界面驱动真实的 MainWindow 和各个栈, 每一步之后检查不变量
+# 操作通过 Card 的鼠标事件和发牌器进入, 和玩家走同样的代码, 合法和非法的都有
+# 每隔一段撤销到底再重做到底, 检查历史记录能还原牌局
+# 出错时把操作序列缩减到仍然出错的最短序列再输出
+# python stress.py --actions 1000000 --seed 1
+
+# 操作, 参数里的牌序号按当前栈长度取模, 缩减后的序列仍然可以执行
+#   ('drag', src, k, dst)  拖动 src 的第 k 张牌到 dst 上方松开
+#   ('click', src)         点击 src 的栈顶牌, 背面时翻开
+#   ('dclick', src, k)     双击, 能归栈时自动归栈
+#   ('deal',)              点击发牌器, 发牌或重洗
+#   ('undo',) ('redo',)
+#   ('auto',)              自动完成走一批, 只在计时器启动时有效
+#   ('settings', deal_n, rounds_n)
+#   ('reset', seed)        换一局
+# 牌堆被发牌器挡住, 不直接点击或拖动其中的牌
+
+START_SEED = 0
+LAYOUT_EVERY = 64  # 每多少步检查一次牌的位置
+HISTORY_EVERY = 1024  # 每多少步检查一次撤销/重做
+
+
+class InvariantError(Exception):
+    pass
+
+
+def mouse_event(kind):
+    return QGraphicsSceneMouseEvent(kind)
+
+
+# 按下, 移到 target 的落牌区域中心, 松开; 按下没有被接受时 Qt 不会发送松开
+def drag(card, target):
+    press = mouse_event(QEvent.Type.GraphicsSceneMousePress)
+    card.mousePressEvent(press)
+    if not press.isAccepted():
+        return False
+
+    x1, y1, x2, y2 = target.zone
+    center = card.sceneBoundingRect().center()
+    card.setPos(card.pos() + QPointF((x1 + x2) / 2 - center.x(), (y1 + y2) / 2 - center.y()))
+    card.mouseReleaseEvent(mouse_event(QEvent.Type.GraphicsSceneMouseRelease))
+    return True
+
+
+def click(card):
+    press = mouse_event(QEvent.Type.GraphicsSceneMousePress)
+    card.mousePressEvent(press)
+    if press.isAccepted():
+        card.mouseReleaseEvent(mouse_event(QEvent.Type.GraphicsSceneMouseRelease))
+
+
+# Qt 的双击顺序: 按下, 松开, 双击, 松开
+def double_click(card):
+    click(card)
+    event = mouse_event(QEvent.Type.GraphicsSceneMouseDoubleClick)
+    card.mouseDoubleClickEvent(event)
+    if event.isAccepted():
+        card.mouseReleaseEvent(mouse_event(QEvent.Type.GraphicsSceneMouseRelease))
+
+
+class Harness:
+    def __init__(self, window):
+        self.window = window
+        self.completes = 0
+        self.wins = 0
+        self.errors = []  # 信号处理函数中的异常不会传给发出者, 经 sys.excepthook 收集
+        window.scene.dispatcher.item_event.connect(self.item_event)
+        self._excepthook = sys.excepthook
+        sys.excepthook = lambda kind, error, traceback: self.errors.append(error)
+
+    def close(self):
+        sys.excepthook = self._excepthook
+
+    # 每次运行前回到同一个起点
+    def start(self):
+        self.errors.clear()
+        window = self.window
+        window.set_deal_n(3)
+        window.set_rounds_n(3)
+        window.shuffle_and_stack(START_SEED)
+
+    # scene.dispatcher.item_event ->
+    def item_event(self, item, event, arg):
+        if event != COMPLETE:
+            return
+        if not isinstance(item, DropStack) or not item.is_complete or len(item.cards) != 13:
+            raise InvariantError('COMPLETE from an incomplete stack %r' % item)
+        self.completes += 1
+
+    # 执行一个操作, 返回是否改变了牌局
+    def apply(self, action):
+        window = self.window
+        before = window.move_count, len(window.history), window.history.can_redo()
+        kind = action[0]
+        if kind == 'drag':
+            _, src, k, dst = action
+            cards = window.stacks[src].cards
+            if cards:
+                drag(cards[k % len(cards)], window.stacks[dst])
+        elif kind == 'click':
+            cards = window.stacks[action[1]].cards
+            if cards:
+                click(cards[-1])
+        elif kind == 'dclick':
+            _, src, k = action
+            cards = window.stacks[src].cards
+            if cards:
+                double_click(cards[k % len(cards)])
+        elif kind == 'deal':
+            window.dealtrigger.mousePressEvent(mouse_event(QEvent.Type.GraphicsSceneMousePress))
+        elif kind == 'undo':
+            window.undo()
+        elif kind == 'redo':
+            window.redo()
+        elif kind == 'auto':
+            if window.autocomplete_timer.isActive():
+                window.autocomplete_step()
+        elif kind == 'settings':
+            window.set_deal_n(action[1])
+            window.set_rounds_n(action[2])
+        elif kind == 'reset':
+            window.shuffle_and_stack(action[1])
+
+        # 赢了: 胜利动画期间不能操作, 直接换下一局
+        if window.animation.is_active():
+            self.wins += 1
+            window.shuffle_and_stack(len(window.history))
+
+        if self.errors:
+            error = self.errors[0]
+            self.errors.clear()
+            raise error
+        return (window.move_count, len(window.history), window.history.can_redo()) != before
+
+    # 缩减时每个候选序列都从头执行, 只在最后检查一次, 否则总耗时是序列长度的平方
+    def run(self, actions):
+        self.start()
+        for action in actions:
+            self.apply(action)
+        check(self.window, layout=True)
+        check_history(self.window)
+
+    # 从起点执行整个序列, 出错时返回原因, 不出错时返回 None
+    def failure(self, actions):
+        try:
+            self.run(actions)
+        except Exception as e:
+            return '%s: %s' % (type(e).__name__, e)
+        return None
+
+
+# 随机产生下一个操作; 近一半是合法走法, 其中一半按贪心策略, 保证牌局能推进到归栈和胜利
+def random_action(window, rng):
+    r = rng.random()
+    if r < 0.45:
+        game = window.game_state()
+        flips = [src for src in model.WORKS if game.can_flip(src)]
+        if flips:
+            return 'click', flips[0]
+        move = estimate.greedy_move(game) if r < 0.25 else None
+        if move is None:
+            legal = moves.legal_moves(game)
+            move = legal and rng.choice(legal)
+        if move:
+            src, index, dst = move
+            return 'drag', src, index, dst
+        return 'deal',
+    if r < 0.55:
+        return 'drag', rng.randrange(1, 13), rng.randrange(24), rng.randrange(13)
+    if r < 0.65:
+        return 'click', rng.randrange(1, 9)
+    if r < 0.72:
+        return 'dclick', rng.randrange(1, 13), rng.randrange(24)
+    if r < 0.85:
+        return 'deal',
+    if r < 0.89:
+        return 'undo',
+    if r < 0.92:
+        return 'redo',
+    if r < 0.995:
+        return 'auto',
+    if r < 0.998:
+        return 'settings', rng.choice((1, 3)), rng.choice((3, 5, None))
+    return 'reset', rng.randrange(2 ** 31)
+
+
+# 不变量, 不成立时抛出 InvariantError; layout 时还检查每张牌的位置
+def check(window, layout=True):
+    stacks = window.stacks
+    cards = [card for stack in stacks for card in stack.cards]
+    if len(cards) != 52 or len(set(map(id, cards))) != 52:
+        raise InvariantError('%d cards on the table, %d unique' % (len(cards), len(set(map(id, cards)))))
+    if sorted(card.id for card in cards) != list(range(52)):
+        raise InvariantError('duplicate card ids')
+
+    for stack in stacks:
+        for n, card in enumerate(stack.cards):
+            if card.stack is not stack or card.index != n:
+                raise InvariantError('card %d: stack/index %r/%r, expected %r/%d' % (
+                    card.id, card.stack, card.index, stack, n,
+                ))
+
+        # 落牌区域跟随栈顶
+        zone = stack.sceneBoundingRect()
+        if stack.cards:
+            zone = zone.united(stack.cards[-1].sceneBoundingRect())
+        if stack.zone != zone.getCoords():
+            raise InvariantError('stale drop zone on %r' % stack)
+
+        if isinstance(stack, WorkStack):
+            check_work(stack)
+        else:
+            for card in stack.cards:
+                if card.parentItem() is not None:
+                    raise InvariantError('card %d in %r has a parent item' % (card.id, stack))
+            if isinstance(stack, DropStack):
+                check_drop(stack)
+            elif isinstance(stack, DeckStack):
+                if any(card.is_face_up for card in stack.cards):
+                    raise InvariantError('face up card in the deck')
+            elif isinstance(stack, DealStack):
+                if not all(card.is_face_up for card in stack.cards):
+                    raise InvariantError('face down card in the deal stack')
+
+    if not layout:
+        return
+
+    # 重新摆放不应移动任何牌
+    before = [(card.scenePos(), card.zValue()) for card in window.cards]
+    for stack in stacks:
+        stack.update()
+    after = [(card.scenePos(), card.zValue()) for card in window.cards]
+    if before != after:
+        moved = [card.id for card, a, b in zip(window.cards, before, after) if a != b]
+        raise InvariantError('cards out of place: %r' % moved)
+
+
+def snapshot(game):
+    return [bytes(cards) for cards in game.stacks], bytes(game.face_up), game.restack_counter, game.spread_from
+
+
+# 撤销到底再重做到底: 撤销到底应回到开局(历史记录没有超出上限时), 重做到底应回到原来的牌局
+# 不记入录像, 自动完成的计时器被撤销停下, 检查完恢复
+def check_history(window):
+    if window.animation.is_active():
+        return  # 胜利动画中不能撤销
+    recorder, window.recorder = window.recorder, None
+    autocompleting = window.autocomplete_timer.isActive()
+    try:
+        before = snapshot(window.game_state())
+        undone = 0
+        while window.history.can_undo():
+            window.undo()
+            undone += 1
+
+        if recorder is not None and undone < window.history.limit:
+            start = snapshot(savegame.decode(recorder.start)[0])
+            if snapshot(window.game_state()) != start:
+                raise InvariantError('undoing %d moves did not restore the start of the game' % undone)
+            check(window, layout=False)
+
+        for _ in range(undone):
+            window.redo()
+        if snapshot(window.game_state()) != before:
+            raise InvariantError('undoing and redoing %d moves changed the game' % undone)
+    finally:
+        window.recorder = recorder
+        if autocompleting:
+            window.autocomplete_timer.start()
+
+
+def check_work(stack):
+    if stack.zValue() != -1:
+        raise InvariantError('%r left active' % stack)
+    parent = stack
+    face_up = False
+    for card in stack.cards:
+        if card.parentItem() is not parent:
+            raise InvariantError('card %d: parent item %r, expected %r' % (card.id, card.parentItem(), parent))
+        if face_up and not card.is_face_up:
+            raise InvariantError('face down card %d above a face up card' % card.id)
+        if face_up and not model.work_accepts(parent.id, card.id):
+            raise InvariantError('card %d does not follow %d' % (card.id, parent.id))
+        face_up = card.is_face_up
+        parent = card
+
+
+def check_drop(stack):
+    top = stack.cards[-1] if stack.cards else None
+    if stack.value != (top.value if top else 0) or stack.suit != (top.suit if top else None):
+        raise InvariantError('%r value/suit %r/%r, top %r' % (stack, stack.value, stack.suit, top and top.id))
+    for n, card in enumerate(stack.cards):
+        if card.value != n + 1 or card.suit != stack.suit or not card.is_face_up:
+            raise InvariantError('card %d out of sequence in %r' % (card.id, stack))
+
+
+# 缩减到仍然出错的最短序列: 先按块删除, 块逐渐变小, 最后逐个删除
+def shrink(harness, actions):
+    chunk = len(actions) // 2
+    while chunk >= 1:
+        n = 0
+        while n < len(actions):
+            candidate = actions[:n] + actions[n + chunk:]
+            if harness.failure(candidate):
+                actions = candidate
+            else:
+                n += chunk
+        chunk //= 2
+    return actions
+
+
+# 随机执行 args.actions 步, 出错时缩减并输出最短序列, 返回退出码
+def stress(harness, args):
+    window = harness.window
+    harness.start()
+
+    rng = random.Random(args.seed)
+    actions = []
+    kinds = Counter()
+    changed = Counter()
+    error = None
+    start = time.perf_counter()
+    for n in range(args.actions):
+        action = random_action(window, rng)
+        actions.append(action)
+        kinds[action[0]] += 1
+        try:
+            changed[action[0]] += harness.apply(action)
+            check(window, layout=n % LAYOUT_EVERY == 0 or n == args.actions - 1)
+            if n % HISTORY_EVERY == HISTORY_EVERY - 1 or n == args.actions - 1:
+                check_history(window)
+        except Exception as e:
+            error = '%s: %s' % (type(e).__name__, e)
+            break
+    elapsed = time.perf_counter() - start
+
+    print('{} actions in {:.1f} s, {:.0f} actions/s, {} drops completed, {} games won'.format(
+        len(actions), elapsed, len(actions) / elapsed, harness.completes, harness.wins,
+    ))
+    for kind, count in sorted(kinds.items()):
+        print('  {:<9} {:>9} {:>9} changed the game'.format(kind, count, changed[kind]))
+
+    if error is None:
+        return 0
+
+    print('FAILED at action {}: {}'.format(len(actions) - 1, error), file=sys.stderr)
+    actions = shrink(harness, actions)
+    print('minimal sequence ({} actions, from reset {}): {}'.format(
+        len(actions), START_SEED, harness.failure(actions),
+    ), file=sys.stderr)
+    for action in actions:
+        print('  %r' % (action,), file=sys.stderr)
+    return 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Random invariant stress test for the solitaire table.')
+    parser.add_argument('--actions', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    app = QApplication(sys.argv)
+
+    from main import MainWindow
+
+    window = MainWindow(resume=False, stats_path=None, replay_path=None, resume_path=None)
+    window.chance_action.setChecked(False)
+    harness = Harness(window)
+    try:
+        return stress(harness, args)
+    finally:
+        harness.close()
+        window.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1 +1,2 @@
-from .equalizer_bar import EqualizerBar
\ No newline at end of file
+from .equalizer_bar import EqualizerBar
+from .spectrum import SpectrumSource
\ No newline at end of file
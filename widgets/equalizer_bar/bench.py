@@ -0,0 +1,163 @@
+import argparse
+import glob
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import wave
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import numpy as np
+from PySide6.QtCore import QTimer
+from PySide6.QtWidgets import QApplication
+
+from equalizer_bar import EqualizerBar
+from spectrum import FPS, Analyzer, RingBuffer, SpectrumSource, read_wav, tones
+
+# 频谱基准, 无界面运行, 输出JSON
+#   离线: WAV 尽快读完并按 FPS 分析, 实时倍数 = 音频时长 / 耗时, 必须大于 1
+#   实时: 按真实时间播放, 测量最新一帧写入到推给 EqualizerBar 的延迟
+# 不指定 --fixtures 时在临时目录生成 48 kHz 立体声的测试文件
+# python bench.py --fixtures wavs --json bench.json
+
+RATE = 48000
+N_BARS = 32
+LATENCY_BOUND_MS = 3 * 1000 / FPS # 最多落后三帧
+MIN_REALTIME_FACTOR = 1.0
+
+
+def write_wav(path, samples, rate=RATE, width=2):
+    full = 2 ** (8 * width - 1)
+    scaled = np.clip(np.round(samples * full), -full, full - 1).astype('<i4')
+    if width == 2:
+        data = scaled.astype('<i2').tobytes()
+    else:
+        data = scaled.view(np.uint8).reshape(-1, 4)[:, :width].tobytes()
+    with wave.open(path, 'wb') as f:
+        f.setnchannels(samples.shape[1])
+        f.setsampwidth(width)
+        f.setframerate(rate)
+        f.writeframes(data)
+
+
+# 测试文件: 正弦组合, 白噪声, 对数扫频, 24位正弦组合
+def make_fixtures(directory, seconds):
+    n = int(seconds * RATE)
+    rng = np.random.default_rng(0)
+    t = np.arange(n) / RATE
+    sweep = np.sin(2 * np.pi * 20 * seconds / np.log(1000) * (1000 ** (t / seconds) - 1)) * 0.5
+    mix = np.concatenate(list(tones(RATE, seconds=seconds)))[:n]
+    fixtures = {
+        'tones.wav': (mix, 2),
+        'noise.wav': (rng.uniform(-0.5, 0.5, (n, 2)), 2),
+        'sweep.wav': (np.column_stack((sweep, sweep)), 2),
+        'tones24.wav': (mix, 3),
+    }
+    paths = []
+    for name, (samples, width) in fixtures.items():
+        path = os.path.join(directory, name)
+        write_wav(path, samples, width=width)
+        paths.append(path)
+    return paths
+
+
+# 读完整个文件, 每 RATE / FPS 帧分析一次
+def bench_offline(path):
+    rate, channels, blocks = read_wav(path)
+    ring = RingBuffer(rate, channels)
+    analyzer = Analyzer(N_BARS, rate)
+    hop = rate // FPS
+
+    times = []
+    frames = due = 0
+    start = time.perf_counter()
+    for block in blocks:
+        ring.write(block)
+        frames += len(block)
+        while frames >= due + hop:
+            due += hop
+            t = time.perf_counter()
+            analyzer.levels(ring.latest(analyzer.fft_size)[0])
+            times.append(time.perf_counter() - t)
+    elapsed = time.perf_counter() - start
+
+    return {
+        'audio_s': frames / rate,
+        'elapsed_s': elapsed,
+        'realtime_factor': frames / rate / elapsed,
+        'analysis_p50_ms': statistics.median(times) * 1000,
+        'analysis_max_ms': max(times) * 1000,
+    }
+
+
+# 按真实时间播放 seconds 秒
+def bench_realtime(app, path, seconds):
+    rate, channels, blocks = read_wav(path)
+    bar = EqualizerBar(N_BARS, 10)
+    source = SpectrumSource(bar, rate, channels)
+    source.play(blocks)
+    source.start()
+
+    QTimer.singleShot(round(seconds * 1000), app.quit)
+    app.exec()
+    source.stop()
+
+    latency = sorted(source.latency)
+    return {
+        'frames': source.frames,
+        'dropped': source.dropped,
+        'latency_p50_ms': latency[len(latency) // 2] * 1000,
+        'latency_p99_ms': latency[min(len(latency) - 1, len(latency) * 99 // 100)] * 1000,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the EqualizerBar spectrum pipeline offscreen.')
+    parser.add_argument('--fixtures', default=None, help='directory of WAV files, generated when omitted')
+    parser.add_argument('--seconds', type=float, default=20, help='length of generated fixtures')
+    parser.add_argument('--realtime-seconds', type=float, default=3)
+    parser.add_argument('--json', default=None, help='write results to this file')
+    args = parser.parse_args(argv)
+
+    app = QApplication(sys.argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        if args.fixtures:
+            paths = sorted(glob.glob(os.path.join(args.fixtures, '*.wav')))
+        else:
+            paths = make_fixtures(directory, args.seconds)
+
+        results = {}
+        failed = []
+        for path in paths:
+            name = os.path.basename(path)
+            result = bench_offline(path)
+            result.update(bench_realtime(app, path, args.realtime_seconds))
+            result['ok'] = (
+                result['realtime_factor'] >= MIN_REALTIME_FACTOR
+                and result['latency_p99_ms'] <= LATENCY_BOUND_MS
+            )
+            if not result['ok']:
+                failed.append(name)
+            results[name] = result
+
+    report = {
+        'fps': FPS,
+        'bars': N_BARS,
+        'latency_bound_ms': LATENCY_BOUND_MS,
+        'fixtures': results,
+        'failed': failed,
+    }
+    text = json.dumps(report, indent=2)
+    if args.json:
+        with open(args.json, 'w') as f:
+            f.write(text)
+    print(text)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
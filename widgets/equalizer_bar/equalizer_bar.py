@@ -1,8 +1,58 @@
-from PySide6.QtCore import QRect, QRectF, QSize, Qt, QTimer
-from PySide6.QtGui import QBrush, QColor, QPainter
+import math
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+from PySide6.QtCore import QObject, QPointF, QRectF, QSize, QTimer
+from PySide6.QtGui import QColor, QPainter, QPixmap
 from PySide6.QtWidgets import QSizePolicy, QWidget
 
 
+# 共享的衰减时钟: 同一衰减频率的 EqualizerBar 共用一个 QTimer, 每次 timeout 依次衰减所有在动的实例
+# 值全部回落到 _vmin 的和隐藏的实例不在其中, 没有在动的实例时计时器停止
+class DecayClock(QObject):
+    _clocks = {} # 间隔(ms) -> DecayClock
+
+    @classmethod
+    def get(cls, ms):
+        if ms not in cls._clocks:
+            cls._clocks[ms] = cls(ms)
+        return cls._clocks[ms]
+
+    def __init__(self, ms):
+        super().__init__()
+        self._bars = {} # 在动的实例, 按加入顺序
+        self._timer = QTimer(self)
+        self._timer.setInterval(ms)
+        self._timer.timeout.connect(self._tick)
+
+    def __len__(self):
+        return len(self._bars)
+
+    def is_active(self):
+        return self._timer.isActive()
+
+    def wake(self, bar):
+        self._bars[bar] = None
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def sleep(self, bar):
+        self._bars.pop(bar, None)
+        if not self._bars:
+            self._timer.stop()
+
+    def _tick(self):
+        for bar in list(self._bars):
+            try:
+                moving = bar._decay_beat()
+            except RuntimeError:
+                moving = False # 组件已销毁
+            if not moving:
+                del self._bars[bar]
+        if not self._bars:
+            self._timer.stop()
+
+
 class EqualizerBar(QWidget):
     def __init__(self, bars, steps):
         super().__init__()
@@ -19,6 +69,7 @@ class EqualizerBar(QWidget):
 
         else:
             raise TypeError('steps must be a list or int')
+        self._colors = [QColor(c) for c in self.steps] # 颜色只解析一次
 
 
         self.n_bars = bars # 列数
@@ -27,27 +78,81 @@ class EqualizerBar(QWidget):
         self._background_color = QColor('black') # 背景颜色
         self._padding = 25
 
-        self._timer = None # 计时器
-        self.setDecayFrequencyMs(100) # 衰弱频率
-        self._decay = 10 # 衰弱频率
+        self._decay = 10 # 每次衰弱的值
 
         self._vmin = 0
         self._vmax = 100
 
-        self._values = [0.0] * bars # 列值 list
+        # 列值, 连续的 float64 数组; setValues 传入的数组直接使用, 衰减写到自己的 _buffer 中, 不改动调用者的数据
+        self._buffer = np.zeros(bars, dtype=np.float64)
+        self._values = self._buffer
+
+        self._clock = None # 共享的衰减时钟
+        self.setDecayFrequencyMs(100) # 衰弱频率
+
+        # 绘制缓存, 见 _update_cache
+        self._column = None # 整列亮起的图片
+        self._tops = None # 亮 n 层时最上面一格的顶边
+        self._rows = None # 同上, 整列图片中的像素行
+        self._bar_x = None # 每列的横坐标, 对齐到设备像素
+        self._top = None # 绘制区域顶边, 对齐到设备像素
+        self._bar_width = None # 每列贴图的宽度, 整列图片按整像素取整, 比列宽略宽, 会盖住右边一列的一小部分
+
+        self._shown = None # 最近一次请求重绘时每列亮的层数, 用来找出变化的格子
 
+    # 只画 event.region() 中的矩形: 每个矩形填背景, 再贴和它相交的列, 局部刷新时只有变化的格子
     def paintEvent(self, event):
-        painter = QPainter(self) # 关联的设备device
+        if self._tops is None:
+            self._update_cache()
 
-        brush = QBrush()
-        brush.setColor(self._background_color)
-        brush.setStyle(Qt.BrushStyle.SolidPattern)
-        rect = QRect(0, 0, painter.device().width(), painter.device().height())
-        painter.fillRect(rect, brush)
+        levels = self._levels().tolist()
+        self._shown = levels
 
+        painter = QPainter(self) # 关联的设备device
+        for rect in event.region():
+            painter.setClipRect(rect)
+            painter.fillRect(rect, self._background_color)
+            if self._column is None:
+                continue
+
+            # 每列一次贴图: 从预先画好的整列中取下面 level 层, 按整像素行取, 和逐格绘制的结果一致
+            column, rows, ratio = self._column, self._rows, self._column.devicePixelRatio()
+            width, height = column.width(), column.height()
+            top = self._top # 亮 0 层时整列图片顶边的纵坐标
+            left, right = rect.x(), rect.x() + rect.width()
+            first = bisect_right(self._bar_x, left - self._bar_width)
+            for b in range(first, bisect_left(self._bar_x, right)):
+                level = levels[b]
+                if level:
+                    row = rows[level]
+                    painter.drawPixmap(
+                        QPointF(self._bar_x[b], top + row / ratio), column,
+                        QRectF(0, row, width, height - row),
+                    )
 
-        d_height = painter.device().height() - (self._padding * 2)
-        d_width = painter.device().width() - (self._padding * 2)
+        painter.end()
+
+    # 值变化后只重绘亮的层数变了的格子, 没有缓存时整个重绘
+    def _refresh(self):
+        levels = self._levels()
+        shown, self._shown = self._shown, levels.tolist()
+        if shown is None or self._tops is None or self._column is None:
+            self.update()
+            return
+
+        rows, ratio = self._rows, self._column.devicePixelRatio()
+        bottom = self._column.height() # 亮 0 层时到整列图片底部
+        for b in np.flatnonzero(levels != shown).tolist():
+            low, high = sorted((shown[b], self._shown[b]))
+            # 新旧两次贴图的像素行一一对应, 只有 rows[high] 到 rows[low] 之间不同
+            y1 = self._top + rows[high] / ratio
+            y2 = self._top + (rows[low] if low else bottom) / ratio
+            self.update(QRectF(self._bar_x[b], y1, self._bar_width, y2 - y1).toAlignedRect())
+
+    # 缓存布局和整列亮起的图片, 尺寸, 边距, 比例, 颜色变化后重建
+    def _update_cache(self):
+        d_height = self.height() - (self._padding * 2)
+        d_width = self.width() - (self._padding * 2)
 
         step_y = d_height / self.n_steps # 层高
         bar_height = step_y * self._y_solid_percent
@@ -57,22 +162,45 @@ class EqualizerBar(QWidget):
         bar_width = step_x * self._x_solid_percent
         bar_width_space = step_x * (1 - self._y_solid_percent) / 2
 
-        for b in range(self.n_bars):
-            pc = (self._values[b] - self._vmin) / (self._vmax - self._vmin)
-            n_steps_to_draw = int(pc * self.n_steps) # 画几层
+        # 贴图位置对齐到设备像素: 小数位置的贴图在局部刷新(裁剪)和整体重绘时取整可能不同
+        ratio = self.devicePixelRatioF()
+        self._bar_x = [
+            math.floor((self._padding + (step_x * b) + bar_width_space) * ratio + 0.5) / ratio
+            for b in range(self.n_bars)
+        ]
+        self._top = math.floor(self._padding * ratio + 0.5) / ratio
+        # 亮 n 层时最上面一格的顶边, 相对绘制区域顶部
+        self._tops = [d_height - (n * step_y) + bar_height_space for n in range(self.n_steps + 1)]
+
+        if d_height <= 0 or bar_width <= 0:
+            self._column = None
+            return
+
+        # 整列按设备像素比绘制, 底部多留一层, 格子超出绘制区域时也不会被截掉
+        column = QPixmap(math.ceil(bar_width * ratio), math.ceil((d_height + step_y) * ratio))
+        column.setDevicePixelRatio(ratio)
+        self._rows = [max(0, math.floor(top * ratio)) for top in self._tops] # 贴图起始的像素行
+        column.fill(self._background_color)
+        painter = QPainter(column)
+        for n, color in enumerate(self._colors):
+            painter.fillRect(QRectF(0, self._tops[n + 1], bar_width, bar_height), color)
+        painter.end()
+        self._column = column
+        self._bar_width = column.width() / ratio
 
-            for n in range(n_steps_to_draw):
-                brush.setColor(QColor(self.steps[n]))
-                rect = QRectF(
-                    self._padding + (step_x * b) + bar_width_space,
-                    self._padding + d_height - ((1 + n) * step_y) + bar_height_space,
-                    bar_width,
-                    bar_height,
-                )
+    def _invalidate(self):
+        self._column = None
+        self._tops = None
+        self.update()
 
-                painter.fillRect(rect, brush)
+    def resizeEvent(self, event):
+        self._invalidate()
+        super().resizeEvent(event)
 
-        painter.end()
+    # 每列亮几层: 按范围归一化, 超出范围的值截到 0..n_steps
+    def _levels(self):
+        pc = (self._values - self._vmin) / (self._vmax - self._vmin)
+        return np.clip((pc * self.n_steps).astype(np.intp), 0, self.n_steps)
 
     # 组件尺寸
     def sizeHint(self):
@@ -87,25 +215,48 @@ class EqualizerBar(QWidget):
         self._decay = float(f)
 
     # 修改衰弱频率
+    # 同一频率的实例共用一个 DecayClock, 0 为不衰弱
     def setDecayFrequencyMs(self, ms):
-        if self._timer:
-            self._timer.stop()
+        if self._clock is not None:
+            self._clock.sleep(self)
+        self._clock = DecayClock.get(ms) if ms else None
+        self._wake()
 
-        if ms:
-            self._timer = QTimer()
-            self._timer.setInterval(ms)
-            self._timer.timeout.connect(self._decay_beat)
-            self._timer.start()
+    # 有值高于 _vmin 且可见时加入时钟
+    def _wake(self):
+        if self._clock is not None and self.isVisible() and not self._at_rest():
+            self._clock.wake(self)
 
-    # 槽函数,衰弱,按照DecayFrequencyMs的频率
-    def _decay_beat(self):
-        self._values = [max(0, v - self._decay) for v in self._values]
-        self.update()
+    def _at_rest(self):
+        return not (self._values > self._vmin).any()
 
-    # 修改值
+    # 由 DecayClock 调用, 衰弱一次, 返回是否还没有落到底
+    def _decay_beat(self):
+        np.subtract(self._values, self._decay, out=self._buffer)
+        np.clip(self._buffer, self._vmin, self._vmax, out=self._buffer)
+        self._values = self._buffer
+        self._refresh()
+        return not self._at_rest()
+
+    # 隐藏时不衰弱, 重新显示后继续
+    def showEvent(self, event):
+        super().showEvent(event)
+        self._wake()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        if self._clock is not None:
+            self._clock.sleep(self)
+
+    # 修改值, 接受 list, numpy 数组或支持 buffer 协议的对象(如 array('d'))
+    # 已经是连续 float64 的不复制
     def setValues(self, v):
-        self._values = v
-        self.update()
+        values = np.ascontiguousarray(v, dtype=np.float64)
+        if values.shape != (self.n_bars,):
+            raise ValueError('expected %d values, got shape %r' % (self.n_bars, values.shape))
+        self._values = values
+        self._wake()
+        self._refresh()
 
     # 返回值
     def values(self):
@@ -115,36 +266,40 @@ class EqualizerBar(QWidget):
     def setRange(self, vmin, vmax):
         assert float(vmin) < float(vmax) # 错误就崩溃
         self._vmin, self._vmax = float(vmin), float(vmax)
+        self._wake()
+        self._refresh()
 
     # 修改单色
     def setColor(self, color):
         self.steps = [color] * self.n_steps
-        self.update()
+        self._colors = [QColor(color)] * self.n_steps
+        self._invalidate()
 
     # 修改花色
     def setColors(self, colors):
         self.n_steps = len(colors)
         self.steps = colors
-        self.update()
+        self._colors = [QColor(c) for c in colors]
+        self._invalidate()
 
     # 修改边距
     def setBarPadding(self, i):
         self._padding = int(i)
-        self.update()
+        self._invalidate()
 
     # 修改X比例
     def setBarSolidXPercent(self, f):
         self._x_solid_percent = float(f)
-        self.update()
+        self._invalidate()
 
     # 修改Y比例
     def setBarSolidYPercent(self, f):
         self._y_solid_percent = float(f)
-        self.update()
+        self._invalidate()
 
     # 修改背景颜色
     def setBackgroundColor(self, color):
         self._background_color = QColor(color)
-        self.update()
+        self._invalidate()
 
 
@@ -1,17 +1,18 @@
-import random
 import sys
 
-from PySide6.QtCore import QTimer
 from PySide6.QtWidgets import QApplication, QMainWindow
 
 from equalizer_bar import EqualizerBar
+from spectrum import SpectrumSource, read_wav, tones
+
+# python main.py [file.wav], 不指定文件时播放生成的测试音
 
 class Window(QMainWindow):
-    def __init__(self):
+    def __init__(self, path=None):
         super().__init__()
 
         self.equalizer = EqualizerBar(
-        5,
+        32,
             [
                 "#0C0786",
                 "#40039C",
@@ -30,19 +31,22 @@ class Window(QMainWindow):
         # self.equalizer.setBarSolidXPercent(0.4)
         self.setCentralWidget(self.equalizer)
 
-        self._timer = QTimer()
-        self._timer.setInterval(100)
-        self._timer.timeout.connect(self.update_values)
-        self._timer.start()
+        # 频谱在工作线程中计算, 按显示帧率推给 equalizer
+        if path:
+            rate, channels, blocks = read_wav(path)
+        else:
+            rate, channels = 48000, 2
+            blocks = tones(rate, channels)
+        self.spectrum = SpectrumSource(self.equalizer, rate, channels)
+        self.spectrum.play(blocks)
+        self.spectrum.start()
 
-    def update_values(self):
-        self.equalizer.setValues(
-            [min(100, v + random.randint(0, 50) if random.randint(0, 5) > 2 else v) for v in
-             self.equalizer.values()]
-        )
+    def closeEvent(self, event):
+        self.spectrum.stop()
+        super().closeEvent(event)
 
 
 app = QApplication(sys.argv)
-w = Window()
+w = Window(sys.argv[1] if len(sys.argv) > 1 else None)
 w.show()
 app.exec()
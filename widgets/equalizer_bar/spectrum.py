@@ -0,0 +1,239 @@
+import math
+import threading
+import time
+import wave
+from collections import deque
+
+import numpy as np
+from PySide6.QtCore import QObject, QTimer
+
+# 频谱: PCM 来自 WAV 文件, 生成器或环形缓冲区, 在工作线程中加窗做 FFT,
+# 按对数间隔分成 n_bars 段, 以显示帧率推给 EqualizerBar
+# 数据流: 来源 -> RingBuffer -> 工作线程每帧取最新 FFT_SIZE 帧分析 -> GUI线程定时 setValues
+# 工作线程只分析最新的数据, 落后时丢帧, 延迟不会累积
+
+FFT_SIZE = 2048 # 48 kHz 时约 43 ms
+FPS = 60 # 分析和刷新的帧率
+BLOCK = 512 # 读取 WAV, 生成器每块的帧数, 48 kHz 时约 11 ms, 比一帧短
+FMIN = 40 # 最低频段的下限(Hz)
+DB_RANGE = 60 # 显示的动态范围, 0 dBFS 为满格
+
+
+# 读取 PCM WAV -> (采样率, 声道数, 每块 (帧数, 声道数) float32 的生成器)
+def read_wav(path, block=BLOCK):
+    with wave.open(path, 'rb') as f:
+        rate, channels = f.getframerate(), f.getnchannels()
+    return rate, channels, _wav_blocks(path, block)
+
+
+def _wav_blocks(path, block):
+    with wave.open(path, 'rb') as f:
+        channels, width = f.getnchannels(), f.getsampwidth()
+        while True:
+            data = f.readframes(block)
+            if not data:
+                return
+            yield pcm_to_float(data, width).reshape(-1, channels)
+
+
+# 整数 PCM -> [-1, 1) 的 float32
+def pcm_to_float(data, width):
+    if width == 1:
+        return (np.frombuffer(data, np.uint8).astype(np.float32) - 128) / 128
+    if width == 2:
+        return np.frombuffer(data, '<i2').astype(np.float32) / 2 ** 15
+    if width == 3:
+        raw = np.frombuffer(data, np.uint8).reshape(-1, 3).astype(np.int32)
+        values = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+        values -= (values & 0x800000) << 1 # 符号扩展
+        return values.astype(np.float32) / 2 ** 23
+    if width == 4:
+        return np.frombuffer(data, '<i4').astype(np.float32) / 2 ** 31
+    raise ValueError('unsupported sample width %d' % width)
+
+
+# 测试用的生成器: 几个音高轮流变化的正弦波, 每块 (block, channels)
+def tones(rate, channels=2, block=BLOCK, freqs=(110, 440, 1760, 7040), seconds=None):
+    t = 0
+    total = None if seconds is None else int(seconds * rate)
+    while total is None or t < total:
+        n = np.arange(t, t + block)
+        mix = np.zeros(block)
+        for k, freq in enumerate(freqs):
+            gain = 0.5 + 0.5 * math.sin(2 * math.pi * (t / rate / 4 + k / len(freqs)))
+            mix += gain * np.sin(2 * np.pi * freq * n / rate)
+        mix = (mix / len(freqs)).astype(np.float32)
+        yield np.repeat(mix[:, None], channels, axis=1)
+        t += block
+
+
+# 多声道 PCM 环形缓冲区, 一个线程写, 其它线程读最新的数据
+class RingBuffer:
+    def __init__(self, capacity, channels=2):
+        self.capacity = capacity
+        self.channels = channels
+        self._data = np.zeros((capacity, channels), np.float32)
+        self._lock = threading.Lock()
+        self.written = 0 # 累计写入的帧数
+        self.written_at = 0.0 # 最近一次写入的 time.monotonic()
+
+    # frames: (帧数, 声道数), 单声道可以是一维; 超过容量时只保留最后的部分
+    def write(self, frames):
+        frames = np.asarray(frames, np.float32).reshape(-1, self.channels)
+        total = len(frames)
+        frames = frames[-self.capacity:]
+        n = len(frames)
+        with self._lock:
+            start = (self.written + total - n) % self.capacity
+            first = min(n, self.capacity - start)
+            self._data[start:start + first] = frames[:first]
+            self._data[:n - first] = frames[first:]
+            self.written += total
+            self.written_at = time.monotonic()
+
+    # 最新的 n 帧 -> (帧, 累计写入帧数, 写入时间), 不足 n 帧时返回已有的
+    def latest(self, n):
+        with self._lock:
+            n = min(n, self.capacity, self.written)
+            end = self.written % self.capacity
+            if n <= end:
+                frames = self._data[end - n:end].copy()
+            else:
+                frames = np.concatenate((self._data[end - n:], self._data[:end]))
+            return frames, self.written, self.written_at
+
+
+# 按真实时间把 blocks 写入 ring, 模拟声卡; realtime=False 时尽快写入
+def feed(blocks, ring, rate, stop=None, realtime=True):
+    start = time.monotonic()
+    done = 0
+    for frames in blocks:
+        if stop is not None and stop.is_set():
+            return
+        ring.write(frames)
+        done += len(frames)
+        if realtime:
+            delay = start + done / rate - time.monotonic()
+            if delay > 0:
+                if stop is None:
+                    time.sleep(delay)
+                elif stop.wait(delay):
+                    return
+
+
+# 加窗 FFT, 按对数间隔分段, 每段取峰值, 映射到 0..100
+class Analyzer:
+    def __init__(self, n_bars, rate, fft_size=FFT_SIZE, fmin=FMIN, fmax=None, db_range=DB_RANGE):
+        self.n_bars = n_bars
+        self.rate = rate
+        self.fft_size = fft_size
+        self.db_range = db_range
+
+        self.window = np.hanning(fft_size).astype(np.float32)
+        self._scale = 2 / self.window.sum() # 满幅正弦的峰值为 1
+        self._frame = np.zeros(fft_size, np.float32)
+
+        n_bins = fft_size // 2 + 1
+        fmax = min(fmax or rate / 2, rate / 2)
+        if n_bars + 1 > n_bins:
+            raise ValueError('%d bars need a larger FFT than %d' % (n_bars, fft_size))
+        edges = np.geomspace(fmin, fmax, n_bars + 1) * fft_size / rate
+        edges = np.clip(np.round(edges).astype(np.intp), 1, n_bins - 1)
+        # 低频段比频点还窄, 每段至少一个频点, 依次往上推
+        for n in range(1, len(edges)):
+            edges[n] = max(edges[n], edges[n - 1] + 1)
+        if edges[-1] > n_bins:
+            raise ValueError('%d bars do not fit between %g Hz and %g Hz' % (n_bars, fmin, fmax))
+        self.edges = edges # 第 n 段为频点 [edges[n], edges[n + 1])
+
+    # frames: (帧数, 声道数) 或一维, 取最后 fft_size 帧, 不足时前面补零
+    def levels(self, frames):
+        frames = np.asarray(frames, np.float32)
+        mono = frames.mean(axis=1) if frames.ndim == 2 else frames
+        mono = mono[-self.fft_size:]
+        frame = self._frame
+        frame[:self.fft_size - len(mono)] = 0
+        frame[self.fft_size - len(mono):] = mono
+
+        magnitude = np.abs(np.fft.rfft(frame * self.window)) * self._scale
+        peaks = np.maximum.reduceat(magnitude[:self.edges[-1]], self.edges[:-1])
+        db = 20 * np.log10(peaks + 1e-12)
+        return np.clip((db + self.db_range) * (100 / self.db_range), 0, 100).astype(np.float64)
+
+
+# 把音频来源接到 EqualizerBar: 工作线程按 fps 分析, GUI线程按 fps 取最新结果
+class SpectrumSource(QObject):
+    def __init__(self, bar, rate, channels=2, ring=None, fps=FPS, fft_size=FFT_SIZE, parent=None):
+        super().__init__(parent)
+        self.bar = bar
+        self.rate = rate
+        self.fps = fps
+        self.ring = ring or RingBuffer(max(rate, fft_size), channels) # 约1秒
+        self.analyzer = Analyzer(bar.n_bars, rate, fft_size)
+
+        self.latency = deque(maxlen=1024) # 最新一帧写入到推给 bar 的秒数
+        self.frames = 0 # 分析次数
+        self.dropped = 0 # 落后时跳过的帧
+
+        self._lock = threading.Lock()
+        self._latest = None # (levels, 写入时间), GUI线程取走后为 None
+        self._stop = threading.Event()
+        self._threads = []
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(round(1000 / fps))
+        self._timer.timeout.connect(self._push)
+
+    # 在后台线程中按真实时间播放 blocks(WAV 或生成器)
+    def play(self, blocks):
+        thread = threading.Thread(
+            target=feed, args=(blocks, self.ring, self.rate, self._stop), name='spectrum-feed', daemon=True,
+        )
+        self._threads.append(thread)
+        thread.start()
+
+    def start(self):
+        self._stop.clear()
+        thread = threading.Thread(target=self._analyze_loop, name='spectrum-analyze', daemon=True)
+        self._threads.append(thread)
+        thread.start()
+        self._timer.start()
+
+    def stop(self):
+        self._timer.stop()
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    # 工作线程
+    def _analyze_loop(self):
+        period = 1 / self.fps
+        due = time.monotonic()
+        last = 0
+        while not self._stop.wait(max(0.0, due - time.monotonic())):
+            due += period
+            now = time.monotonic()
+            if now - due > period: # 落后超过一帧, 从现在重新计时
+                self.dropped += int((now - due) / period)
+                due = now + period
+
+            frames, written, written_at = self.ring.latest(self.analyzer.fft_size)
+            if written == last:
+                continue
+            last = written
+            levels = self.analyzer.levels(frames)
+            self.frames += 1
+            with self._lock:
+                self._latest = levels, written_at
+
+    # self._timer.timeout ->
+    # 新的峰值顶上去, 回落交给 bar 自己的衰减
+    def _push(self):
+        with self._lock:
+            latest, self._latest = self._latest, None
+        if latest is None:
+            return
+        levels, written_at = latest
+        self.bar.setValues(np.maximum(levels, self.bar.values()))
+        self.latency.append(time.monotonic() - written_at)